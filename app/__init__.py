@@ -1,18 +1,28 @@
-from flask import Flask
+import time
+
+_import_started = time.perf_counter()
+
+from flask import Flask, request
 from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager
+from flask_login import LoginManager, current_user
 from flask_bcrypt import Bcrypt
 from flask_wtf import CSRFProtect
-from flask_socketio import SocketIO, join_room
+from flask_socketio import SocketIO, emit, join_room
 from flask_migrate import Migrate
 from datetime import datetime
 from dotenv import load_dotenv
+import json
+import logging
 import os
 
 # -------------------------------
-# Load environment variables
+# Load environment variables from ENV_FILE if set, else from an untracked
+# .env in the project root (git-ignored; never a committed file).
+# Variables already set in the environment win.
 # -------------------------------
-load_dotenv(r"D:\Projects\TaskScheduler\setupenv.env")  # update path if needed
+load_dotenv(os.environ.get("ENV_FILE") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"
+))
 
 # -------------------------------
 # Initialize extensions
@@ -24,20 +34,74 @@ csrf = CSRFProtect()
 socketio = SocketIO(async_mode="eventlet")  # for real-time notifications
 migrate = Migrate()  # Flask-Migrate
 
+from app import metrics  # noqa: E402  (no app dependencies)
+
+log = logging.getLogger(__name__)
+
+# Seconds spent importing the app package and in the last create_app call
+startup_stats = {"import_s": round(time.perf_counter() - _import_started, 3)}
+
+# -------------------------------
+# Logging: LOG_LEVEL (default INFO), LOG_FORMAT "text" or "json"
+# -------------------------------
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def configure_logging():
+    """Give the "app" logger hierarchy one handler (idempotent) and its level."""
+    logger = logging.getLogger("app")
+    logger.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        if os.environ.get("LOG_FORMAT", "text") == "json":
+            handler.setFormatter(_JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
 # -------------------------------
 # SocketIO events
 # -------------------------------
 @socketio.on('join_room')
 def handle_join_room(data):
-    room = data.get('room')
-    if room:
-        join_room(room)
-        print(f"User joined room: {room}")
+    from app import outbox, presence
+    room = (data or {}).get('room')
+    if not room:
+        return
+    # A socket may only join its own logged-in user's room
+    if not current_user.is_authenticated or room != f"user_{current_user.id}":
+        presence.stats["rejected_joins"] += 1
+        log.warning("⚠️ Rejected join for room: %s", room)
+        return
+    join_room(room)
+    presence.joined(current_user.id, request.sid)
+    log.debug("User joined room: %s", room)
+    # Everything that fired while the user had no socket, as one batch
+    missed = outbox.take(current_user.id)
+    if missed:
+        emit('task_notifications', {'items': missed, 'missed': True})
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    from app import presence
+    presence.left(request.sid)
 
 # -------------------------------
 # App factory
 # -------------------------------
-def create_app(testing: bool = False):
+def create_app(testing: bool = False, with_scheduler: bool = True):
+    started = time.perf_counter()
+    configure_logging()
     app = Flask(__name__)
 
     # -------------------------------
@@ -54,17 +118,133 @@ def create_app(testing: bool = False):
         app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
 
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # -------------------------------
+    # Engine / pool options from DB_* env vars; DB_POOL_MODE=transaction
+    # for transaction-mode poolers (see app/db_pool.py)
+    # -------------------------------
+    from app import db_pool
+    app.config['DB_POOL_MODE'] = os.environ.get('DB_POOL_MODE', db_pool.MODE_SESSION)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_pool.engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'], os.environ
+    )
+
+    # -------------------------------
+    # Multi-worker: Socket.IO message queue (e.g. redis://...) shared by all
+    # workers, so the single scheduler leader can emit to any user's room
+    # -------------------------------
+    message_queue = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+
+    # -------------------------------
+    # Scheduler mode: "per_task" (one cron job per task) or "dispatcher".
+    # With several workers only the leader schedules, so tasks added on other
+    # workers must be read from the DB: default to the dispatcher there.
+    # -------------------------------
+    app.config['SCHEDULER_MODE'] = os.environ.get(
+        'SCHEDULER_MODE', 'dispatcher' if message_queue else 'per_task'
+    )
+    # Default timezone for users who have not reported one (IANA name)
+    app.config['TIMEZONE'] = os.environ.get('TIMEZONE', 'Asia/Kolkata')
+    app.config['TASKS_PAGE_SIZE'] = int(os.environ.get('TASKS_PAGE_SIZE', 100))
+    app.config['SCHEDULER_ENABLED'] = with_scheduler
+    app.config['SCHEDULER_LOCK_FILE'] = os.environ.get('SCHEDULER_LOCK_FILE')
+    app.config['LEADER_RETRY_SECONDS'] = int(os.environ.get('LEADER_RETRY_SECONDS', 30))
+    # How often a PostgreSQL leader re-checks its advisory lock (lost with its connection)
+    app.config['LEADER_CHECK_SECONDS'] = int(os.environ.get('LEADER_CHECK_SECONDS', 15))
+    # Fast start: no create_all (migrations own the schema) and the scheduler
+    # is elected/bootstrapped in the background while the server already
+    # accepts requests. DB_CREATE_ALL overrides the schema part either way.
+    app.config['FAST_START'] = os.environ.get('FAST_START', '0') == '1'
+    app.config['DB_CREATE_ALL'] = os.environ.get(
+        'DB_CREATE_ALL', '0' if app.config['FAST_START'] and not testing else '1'
+    ) == '1'
+    # Workers rebuild their polling index this often to see other workers' edits (0 = never)
+    app.config['DUE_INDEX_MAX_AGE'] = int(os.environ.get('DUE_INDEX_MAX_AGE', 60 if message_queue else 0))
+
+    # -------------------------------
+    # Notification pipeline (see app/notifier.py)
+    # -------------------------------
+    app.config['NOTIFY_QUEUE_SIZE'] = int(os.environ.get('NOTIFY_QUEUE_SIZE', 1000))
+    app.config['NOTIFY_WORKERS'] = int(os.environ.get('NOTIFY_WORKERS', 2))
+    app.config['NOTIFY_SOCKET_TIMEOUT'] = float(os.environ.get('NOTIFY_SOCKET_TIMEOUT', 2.0))
+    app.config['NOTIFY_VOICE_TIMEOUT'] = float(os.environ.get('NOTIFY_VOICE_TIMEOUT', 15.0))
+    # Voice alerts (see app/voice.py): "server", "browser" or "off", and the
+    # on-disk cache of rendered clips
+    app.config['VOICE_MODE'] = os.environ.get('VOICE_MODE', 'server')
+    app.config['VOICE_CACHE_DIR'] = os.environ.get('VOICE_CACHE_DIR')
+    app.config['VOICE_CACHE_MAX_MB'] = float(os.environ.get('VOICE_CACHE_MAX_MB', 200))
+    app.config['VOICE_RENDER_TIMEOUT'] = float(os.environ.get('VOICE_RENDER_TIMEOUT', 10.0))
+    app.config['VOICE_RATE'] = int(os.environ['VOICE_RATE']) if os.environ.get('VOICE_RATE') else None
+    app.config['VOICE_ID'] = os.environ.get('VOICE_ID') or None
+    # Socket pushes for one user within this window go out as a single batch
+    app.config['NOTIFY_COALESCE_SECONDS'] = float(os.environ.get('NOTIFY_COALESCE_SECONDS', 1.0))
+    # Offline outbox (see app/outbox.py); presence is per process, so off by
+    # default when workers share a message queue
+    app.config['OUTBOX_ENABLED'] = os.environ.get('OUTBOX_ENABLED', '0' if message_queue else '1') != '0'
+    app.config['OUTBOX_MEMORY_ITEMS'] = int(os.environ.get('OUTBOX_MEMORY_ITEMS', 20))
+    app.config['OUTBOX_MAX_ITEMS'] = int(os.environ.get('OUTBOX_MAX_ITEMS', 200))
+    app.config['OUTBOX_TTL_HOURS'] = int(os.environ.get('OUTBOX_TTL_HOURS', 24))
+    # Fallback polling interval of tabs without a live socket (see app/presence.py)
+    app.config['POLL_INTERVAL_SECONDS'] = int(os.environ.get('POLL_INTERVAL_SECONDS', 300))
+    # How those tabs poll: "long" (the request waits on the server until a task
+    # is due, up to LONGPOLL_MAX_SECONDS) or "short" (sleep until the server's
+    # next-due hint, at most POLL_MAX_SLEEP_SECONDS)
+    app.config['POLL_MODE'] = os.environ.get('POLL_MODE', 'long')
+    app.config['LONGPOLL_MAX_SECONDS'] = int(os.environ.get('LONGPOLL_MAX_SECONDS', 50))
+    app.config['LONGPOLL_MAX_WAITERS'] = int(os.environ.get('LONGPOLL_MAX_WAITERS', 1000))
+    app.config['POLL_MAX_SLEEP_SECONDS'] = int(os.environ.get('POLL_MAX_SLEEP_SECONDS', 900))
+    # Seconds a loaded user is reused by the login user_loader (0 = always query)
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))
+
+    # -------------------------------
+    # Event-trigger tasks (see app/event_sources.py): inboxes the scheduler
+    # leader follows, e.g. "mbox:/var/mail/me,jsonl:whatsapp.jsonl"
+    # -------------------------------
+    app.config['EVENT_SOURCES'] = os.environ.get('EVENT_SOURCES', '')
+    app.config['EVENT_POLL_SECONDS'] = float(os.environ.get('EVENT_POLL_SECONDS', 10))
+    app.config['EVENT_INDEX_MAX_AGE'] = int(os.environ.get('EVENT_INDEX_MAX_AGE', 60 if message_queue else 0))
+    # Bearer token required by /metrics. Without one the endpoint is off, unless
+    # METRICS_PUBLIC=1 opens it (e.g. behind a private scrape network)
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['METRICS_PUBLIC'] = os.environ.get('METRICS_PUBLIC', '0') == '1'
+
+    # -------------------------------
+    # Password hashing (see app/hashing.py): bcrypt work factor and the
+    # bounded pool of OS threads it runs on
+    # -------------------------------
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    app.config['HASH_WORKERS'] = int(os.environ.get('HASH_WORKERS', 4))
+    app.config['HASH_MAX_PENDING'] = int(os.environ.get('HASH_MAX_PENDING', 64))
+    app.config['HASH_QUEUE_TIMEOUT'] = float(os.environ.get('HASH_QUEUE_TIMEOUT', 5.0))
+    app.config['HASH_OFFLOAD'] = os.environ.get('HASH_OFFLOAD', '1') != '0'
+
+    # -------------------------------
+    # Firing ledger (see app/firing_ledger.py)
+    # -------------------------------
+    app.config['FIRING_LEDGER_TTL_HOURS'] = int(os.environ.get('FIRING_LEDGER_TTL_HOURS', 48))
+    app.config['FIRING_CACHE_SIZE'] = int(os.environ.get('FIRING_CACHE_SIZE', 50000))
+    app.config['FIRING_CATCHUP_MINUTES'] = int(os.environ.get('FIRING_CATCHUP_MINUTES', 15))
     app.config['DEBUG'] = False  # 🔒 Production mode
 
+    # Task times are evaluated in each user's zone (falling back to TIMEZONE);
+    # presence needs the polling interval to estimate polls saved
+    from app import recurrence, presence, outbox, voice
+    recurrence.configure(app)
+    presence.configure(app)
+    outbox.configure(app)
+    voice.configure(app)
+
     # -------------------------------
     # Initialize extensions with app
     # -------------------------------
     db.init_app(app)
     migrate.init_app(app, db)  # <-- key for migrations
     bcrypt.init_app(app)
+    from app import hashing
+    hashing.configure(app)
     login_manager.init_app(app)
     csrf.init_app(app)
-    socketio.init_app(app)
+    socketio.init_app(app, message_queue=message_queue)
 
     # -------------------------------
     # LoginManager settings
@@ -75,10 +255,12 @@ def create_app(testing: bool = False):
     # -------------------------------
     # User loader
     # -------------------------------
-    from app.models import User
+    # Served from a short-TTL cache (see app/user_cache.py)
+    from app import user_cache
+    user_cache.configure(app)
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.load(int(user_id))
 
     # -------------------------------
     # Register blueprints
@@ -87,13 +269,23 @@ def create_app(testing: bool = False):
     app.register_blueprint(routes.bp)
 
     # -------------------------------
-    # Create DB tables & start scheduler
+    # CLI commands (import-tasks / export-tasks)
     # -------------------------------
-    from app.scheduler import start_scheduler
+    from app import cli
+    cli.register(app)
+
+    # -------------------------------
+    # Create DB tables & start scheduler (leader process only)
+    # -------------------------------
+    from app.scheduler import start_scheduler, stop_scheduler
+    from app import leader
     with app.app_context():
-        db.create_all()
-        if not testing:
-            start_scheduler(app, socketio)
+        db_pool.instrument(db.engine)
+        if app.config['DB_CREATE_ALL']:
+            db.create_all()
+    if with_scheduler and not testing:
+        leader.elect(app, lambda a: start_scheduler(a, socketio), on_lost=stop_scheduler,
+                     background=app.config['FAST_START'])
 
     # -------------------------------
     # Footer year context
@@ -102,4 +294,16 @@ def create_app(testing: bool = False):
     def inject_now():
         return {'current_year': datetime.utcnow().year}
 
+    startup_stats['create_app_s'] = round(time.perf_counter() - started, 3)
+    startup_stats['fast_start'] = app.config['FAST_START']
+    log.info(
+        "🚀 App ready in %ss (imports %ss, fast start %s)",
+        startup_stats['create_app_s'], startup_stats['import_s'], "on" if app.config['FAST_START'] else "off",
+    )
     return app
+
+
+@metrics.collector
+def _collect_startup():
+    yield ("app_startup_seconds", "gauge", "Time to import the app package and run create_app", ("phase",),
+           [(("import",), startup_stats["import_s"]), (("create_app",), startup_stats.get("create_app_s", 0))])
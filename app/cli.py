@@ -0,0 +1,53 @@
+# app/cli.py
+"""Flask CLI commands, e.g. `flask --app migrate.py import-tasks alice tasks.csv`."""
+import click
+
+from app import event_index, event_sources
+from app.models import Task, User
+from app.services import task_service
+
+
+def register(app):
+    @app.cli.command("import-tasks")
+    @click.argument("username")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    def import_tasks_command(username, path):
+        """Bulk-import tasks for USERNAME from a .csv or .json file."""
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            raise click.ClickException(f"No such user: {username}")
+        fmt = "csv" if path.lower().endswith(".csv") else "json"
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            records = task_service.read_import_records(f.read(), fmt)
+            created, errors = task_service.import_tasks(records, user)
+        for row, message in errors:
+            click.echo(f"⚠️ Row {row} skipped: {message}")
+        click.echo(f"✅ Imported {created} task(s) for {username}")
+
+    @app.cli.command("export-tasks")
+    @click.argument("username")
+    @click.option("--format", "fmt", type=click.Choice(["json", "csv"]), default="json")
+    def export_tasks_command(username, fmt):
+        """Stream USERNAME's tasks to stdout as JSON or CSV."""
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            raise click.ClickException(f"No such user: {username}")
+        for chunk in task_service.export_lines(task_service.export_tasks(user), fmt):
+            click.echo(chunk, nl=False)
+        click.echo()
+
+    @app.cli.command("match-events")
+    @click.argument("spec")
+    def match_events_command(spec):
+        """Dry run: list the event-trigger tasks each message in SPEC (e.g. mbox:inbox.mbox) would fire."""
+        try:
+            source = event_sources.open_source(spec, from_start=True)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        event_index.load()
+        for message in source.poll():
+            ids = event_index.match(message)
+            who = message.sender or message.contact
+            click.echo(f"{message.kind} from {who}: {message.subject or message.text[:40]!r} -> {ids or 'no match'}")
+            for task in Task.query.filter(Task.id.in_(ids)) if ids else ():
+                click.echo(f"    #{task.id} {task.title} (user {task.user_id})")
@@ -0,0 +1,173 @@
+# app/db_pool.py
+"""
+Engine / connection pool configuration and pool metrics.
+
+Options come from the environment (see engine_options). DB_POOL_MODE picks
+how we talk to PgBouncer-style poolers such as Supabase's:
+
+- "session" (default): a local QueuePool of long-lived connections. Right
+  for a direct connection or a session-mode pooler (Supabase :5432).
+- "transaction": for transaction-mode poolers (Supabase :6543). The server
+  connection changes between transactions, so we keep no local pool
+  (NullPool unless DB_POOL_CLASS=queue) and disable server-side prepared
+  statements (psycopg 3 prepare_threshold=None; psycopg2 never prepares).
+  Session-level state does not survive there, so leader election falls back
+  to the file lock (app/leader.py).
+
+Checkout wait and pool usage are recorded in `stats` for /api/pool_stats
+and /metrics, along with the number of statements run (per request on
+flask.g.db_queries, see routes.py).
+"""
+import threading
+import time
+
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app import metrics
+
+MODE_SESSION = "session"
+MODE_TRANSACTION = "transaction"
+
+_lock = threading.Lock()
+_engine = None  # last instrumented engine, reported on /metrics
+stats = {
+    "checkouts": 0,
+    "checkins": 0,
+    "connects": 0,
+    "invalidations": 0,
+    "timeouts": 0,
+    "wait_total_s": 0.0,
+    "wait_max_s": 0.0,
+}
+
+
+def _record_wait(elapsed, timed_out=False):
+    with _lock:
+        stats["wait_total_s"] += elapsed
+        if elapsed > stats["wait_max_s"]:
+            stats["wait_max_s"] = elapsed
+        if timed_out:
+            stats["timeouts"] += 1
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            _record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        _record_wait(time.perf_counter() - started)
+        return conn
+
+
+# -------------------------------
+# Configuration
+# -------------------------------
+def _env_bool(env, name, default):
+    value = env.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def engine_options(url, env):
+    """SQLALCHEMY_ENGINE_OPTIONS for the database URL, from DB_* env vars."""
+    if not url:
+        return {}
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}  # Flask-SQLAlchemy uses a StaticPool for in-memory SQLite
+
+    mode = env.get("DB_POOL_MODE", MODE_SESSION)
+    options = {"pool_pre_ping": _env_bool(env, "DB_POOL_PRE_PING", True)}
+
+    if mode == MODE_TRANSACTION and env.get("DB_POOL_CLASS", "null") != "queue":
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=int(env.get("DB_POOL_SIZE", 10)),
+            max_overflow=int(env.get("DB_MAX_OVERFLOW", 20)),
+            pool_timeout=float(env.get("DB_POOL_TIMEOUT", 10)),
+            # Poolers and load balancers drop idle connections; recycle first
+            pool_recycle=int(env.get("DB_POOL_RECYCLE", 1800)),
+            pool_use_lifo=True,
+        )
+
+    if backend == "postgresql":
+        connect_args = {"connect_timeout": int(env.get("DB_CONNECT_TIMEOUT", 10))}
+        if mode == MODE_TRANSACTION and parsed.get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = None
+        options["connect_args"] = connect_args
+    return options
+
+
+# -------------------------------
+# Metrics
+# -------------------------------
+def instrument(engine):
+    """Count pool events and statements on the engine (call once per engine)."""
+    global _engine
+    _engine = engine
+    def bump(name):
+        def listener(*args):
+            with _lock:
+                stats[name] += 1
+        return listener
+
+    event.listen(engine, "checkout", bump("checkouts"))
+    event.listen(engine, "checkin", bump("checkins"))
+    event.listen(engine, "connect", bump("connects"))
+    event.listen(engine, "invalidate", bump("invalidations"))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(*args):
+        _queries_total.inc()
+        if has_app_context() and "db_queries" in g:
+            g.db_queries += 1
+
+
+_queries_total = metrics.counter("db_queries_total", "SQL statements executed")
+
+
+def snapshot(engine):
+    pool = engine.pool
+    with _lock:
+        data = dict(stats)
+    data["pool_class"] = type(pool).__name__
+    data["wait_avg_ms"] = round(data["wait_total_s"] / data["checkouts"] * 1000, 3) if data["checkouts"] else 0.0
+    data["wait_max_ms"] = round(data.pop("wait_max_s") * 1000, 3)
+    data["wait_total_s"] = round(data["wait_total_s"], 3)
+    if isinstance(pool, QueuePool):
+        data.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow(),
+                    checked_in=pool.checkedin())
+    return data
+
+
+@metrics.collector
+def _collect():
+    if _engine is None:
+        return
+    data = snapshot(_engine)
+    yield ("db_pool_checkouts_total", "counter", "Connections checked out of the pool", (),
+           [((), data["checkouts"])])
+    yield ("db_pool_connects_total", "counter", "New DBAPI connections opened", (), [((), data["connects"])])
+    yield ("db_pool_invalidations_total", "counter", "Connections invalidated", (),
+           [((), data["invalidations"])])
+    yield ("db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a connection", (),
+           [((), data["timeouts"])])
+    yield ("db_pool_wait_seconds_total", "counter", "Total time spent waiting for a connection", (),
+           [((), data["wait_total_s"])])
+    if "size" in data:
+        yield ("db_pool_connections", "gauge", "Pool connections by state", ("state",),
+               [(("checked_out",), data["checked_out"]), (("checked_in",), data["checked_in"]),
+                (("overflow",), data["overflow"])])
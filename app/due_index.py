@@ -0,0 +1,273 @@
+# app/due_index.py
+"""
+In-process index of enabled, notify-enabled tasks, bucketed by the UTC
+minute of their next firing (minutes since the Unix epoch, so every
+timezone shares the same buckets).
+
+    utc_minute -> user_id -> {task_id, ...}
+
+The polling endpoint (/check_notifications) answers from here instead of
+querying the tasks table. task_service keeps it in sync on every write and
+the scheduler moves tasks to their next slot after they fire. A fired slot
+stays in its bucket until that minute is over, so polls during the minute
+still see it.
+
+Long polls park on wait_for_change() and sleep until next_due_minute();
+every change to a user's tasks (and every full reload) wakes that user's
+waiters.
+"""
+import threading
+import time
+from datetime import datetime
+from app import metrics
+from app.models import Task
+
+_EPOCH = datetime(1970, 1, 1)
+
+_lock = threading.RLock()
+_loaded = False
+_epoch = 0       # set on each full load so ETags never survive a rebuild/restart
+_loaded_at = 0.0
+
+_buckets = {}    # utc_minute -> {user_id: set(task_id)}
+_entries = {}    # task_id -> (utc_minute, user_id, title, body) of the upcoming slot
+_fired = {}      # task_id -> (user_id, title, body) for slots kept in a bucket after firing
+_swept_before = 0  # buckets older than this minute have been dropped
+_by_user = {}    # user_id -> set(task_id), so clearing a user is O(own tasks)
+_versions = {}   # user_id -> int, bumped on every change to the user's tasks
+_waiters = {}    # user_id -> threading.Event set on the user's next change
+_next_due = {}   # user_id -> (after, minute) answered by next_due_minute()
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+def minute_of(dt):
+    """Naive UTC datetime -> minutes since the epoch (bucket key)."""
+    return int((dt - _EPOCH).total_seconds() // 60)
+
+
+def current_minute():
+    return int(time.time() // 60)
+
+
+def _bump(user_id):
+    _versions[user_id] = _versions.get(user_id, 0) + 1
+    _next_due.pop(user_id, None)
+    waiter = _waiters.pop(user_id, None)
+    if waiter is not None:
+        waiter.set()
+
+
+def _discard(task_id):
+    entry = _entries.pop(task_id, None)
+    if not entry:
+        return None
+    minute, user_id = entry[0], entry[1]
+    owned = _by_user.get(user_id)
+    if owned is not None:
+        owned.discard(task_id)
+        if not owned:
+            del _by_user[user_id]
+    _unbucket(minute, user_id, task_id)
+    return user_id
+
+
+def _unbucket(minute, user_id, task_id):
+    users = _buckets.get(minute)
+    if users is not None:
+        ids = users.get(user_id)
+        if ids is not None:
+            ids.discard(task_id)
+            if not ids:
+                del users[user_id]
+        if not users:
+            del _buckets[minute]
+
+
+def _sweep(now_minute):
+    """Drop buckets for minutes that are over (kept fired slots go with them)."""
+    global _swept_before
+    if now_minute <= _swept_before:
+        return
+    for minute in [m for m in _buckets if m < now_minute]:
+        for user_id, ids in _buckets.pop(minute).items():
+            for task_id in ids:
+                entry = _entries.get(task_id)
+                if entry is None or entry[0] != minute:
+                    _fired.pop(task_id, None)
+    _swept_before = now_minute
+
+
+def _place(task_id, minute, user_id, title, body):
+    _entries[task_id] = (minute, user_id, title or "Reminder", body or "You have a task!")
+    _buckets.setdefault(minute, {}).setdefault(user_id, set()).add(task_id)
+    _by_user.setdefault(user_id, set()).add(task_id)
+
+
+# -------------------------------
+# Loading
+# -------------------------------
+def load():
+    """(Re)build the whole index from the DB. Needs an app context."""
+    global _loaded, _epoch, _loaded_at, _swept_before
+    rows = (
+        Task.query
+        .with_entities(Task.id, Task.next_fire_at, Task.user_id, Task.title, Task.action)
+        .filter(Task.enabled.is_(True), Task.notify_enabled.is_(True), Task.next_fire_at.isnot(None))
+        .all()
+    )
+    with _lock:
+        _buckets.clear()
+        _entries.clear()
+        _fired.clear()
+        _by_user.clear()
+        _next_due.clear()
+        _swept_before = 0
+        for task_id, next_fire_at, user_id, title, body in rows:
+            _place(task_id, minute_of(next_fire_at), user_id, title, body)
+        _epoch = time.time_ns()
+        _loaded_at = time.monotonic()
+        _loaded = True
+        # Every ETag just changed: let parked long polls re-check
+        for waiter in _waiters.values():
+            waiter.set()
+        _waiters.clear()
+    return len(_entries)
+
+
+def ensure_loaded(max_age=0):
+    """
+    Load on first use. With max_age > 0 the index is rebuilt once it is older
+    than that many seconds, so edits made by other worker processes show up.
+    """
+    if not _loaded or (max_age and time.monotonic() - _loaded_at > max_age):
+        load()
+
+
+# -------------------------------
+# Mutations (called by task_service)
+# -------------------------------
+def upsert(task):
+    """Insert/move/refresh a task after it was added or edited."""
+    minute = minute_of(task.next_fire_at) if task.next_fire_at else None
+    with _lock:
+        old_user = _discard(task.id)
+        if old_user is not None and old_user != task.user_id:
+            _bump(old_user)
+        if task.enabled and task.notify_enabled and minute is not None:
+            _place(task.id, minute, task.user_id, task.title, task.action)
+        _bump(task.user_id)
+
+
+def upsert_many(tasks):
+    """Bulk variant of upsert for freshly imported rows."""
+    with _lock:
+        for task in tasks:
+            upsert(task)
+
+
+def advance(task_id, next_fire_at):
+    """
+    Move a task that just fired to its next slot (None when it is retired).
+    The fired slot stays in its bucket until the minute is over; the user's
+    version is not bumped because the current minute's answer is unchanged.
+    """
+    with _lock:
+        entry = _entries.pop(task_id, None)
+        if entry is None:
+            return
+        minute, user_id, title, body = entry
+        _fired[task_id] = (user_id, title, body)
+        _next_due.pop(user_id, None)
+        if next_fire_at is not None:
+            _place(task_id, minute_of(next_fire_at), user_id, title, body)
+        else:
+            owned = _by_user.get(user_id)
+            if owned is not None:
+                owned.discard(task_id)
+                if not owned:
+                    del _by_user[user_id]
+
+
+def remove(task_id):
+    with _lock:
+        _fired.pop(task_id, None)
+        user_id = _discard(task_id)
+        if user_id is not None:
+            _bump(user_id)
+
+
+def remove_user(user_id):
+    """Drop every task of a user (clear_tasks)."""
+    with _lock:
+        for task_id in list(_by_user.get(user_id, ())):
+            _discard(task_id)
+        for task_id in [t for t, fired in _fired.items() if fired[0] == user_id]:
+            del _fired[task_id]
+        _bump(user_id)
+
+
+# -------------------------------
+# Reads (polling endpoint)
+# -------------------------------
+def etag(user_id, minute):
+    """Cheap validator: changes when the minute rolls over or the user's tasks change."""
+    return f"{_epoch:x}-{minute}-{_versions.get(user_id, 0)}"
+
+
+def due_for_user(user_id, minute):
+    """Tasks of the user due in the given UTC minute (see current_minute())."""
+    with _lock:
+        _sweep(minute)
+        ids = (_buckets.get(minute) or {}).get(user_id) or ()
+        results = []
+        for task_id in sorted(ids):
+            entry = _entries.get(task_id)
+            if entry is not None and entry[0] == minute:
+                title, body = entry[2], entry[3]
+            elif task_id in _fired:
+                _, title, body = _fired[task_id]
+            else:
+                continue  # deleted after it fired
+            results.append({"id": task_id, "title": title, "body": body})
+        return results
+
+
+def version(user_id):
+    return _versions.get(user_id, 0)
+
+
+def next_due_minute(user_id, after):
+    """Earliest UTC minute >= after in which one of the user's tasks is due, or None."""
+    with _lock:
+        cached = _next_due.get(user_id)
+        if cached is not None and cached[0] == after:
+            return cached[1]
+        minute = min((m for m in (_entries[t][0] for t in _by_user.get(user_id, ()) if t in _entries)
+                      if m >= after), default=None)
+        _next_due[user_id] = (after, minute)
+        return minute
+
+
+def wait_for_change(user_id, seen_version, timeout):
+    """
+    Block up to timeout seconds until the user's tasks change from
+    seen_version (see version()). Returns True if they did. A green-thread
+    wait under eventlet, so parked long polls cost no OS thread.
+    """
+    with _lock:
+        if _versions.get(user_id, 0) != seen_version:
+            return True
+        waiter = _waiters.get(user_id)
+        if waiter is None:
+            waiter = _waiters[user_id] = threading.Event()
+    return waiter.wait(timeout)
+
+
+@metrics.collector
+def _collect():
+    with _lock:
+        entries, buckets = len(_entries), len(_buckets)
+    yield ("due_index_entries", "gauge", "Upcoming task slots held in the due index", (), [((), entries)])
+    yield ("due_index_buckets", "gauge", "Minute buckets held in the due index", (), [((), buckets)])
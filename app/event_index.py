@@ -0,0 +1,309 @@
+# app/event_index.py
+"""
+In-process index of armed event-trigger tasks (enabled, notify-enabled,
+event_type set), so an incoming message is matched without scanning them.
+
+A task matches a message of its event_type when every filter it sets holds:
+
+- event_sender:  the email sender address (case-insensitive)
+- event_contact: the WhatsApp contact, a phone number (digits compared) or name
+- event_keyword: any of its comma-separated keywords/phrases appears in the
+                 subject or text as whole words (case-insensitive)
+
+Tasks are filed under the most selective filter they have:
+
+    (event_type, "sender" | "contact", address) -> {task_id}   exact lookup
+    keyword -> event_type -> {task_id}                          keyword-only tasks
+    event_type -> {task_id}                                     no filter at all
+
+and all keywords feed one Aho-Corasick automaton, so a message's keyword
+hits are found in a single pass over its text whatever the number of
+tasks. task_service keeps the index in sync; with several workers the
+leader (which ingests) rebuilds it every EVENT_INDEX_MAX_AGE seconds.
+"""
+import re
+import threading
+import time
+from collections import deque, namedtuple
+from email.utils import parseaddr
+
+from app import metrics
+from app.models import Task
+
+EMAIL = "email"
+WHATSAPP = "whatsapp"
+
+# Longer texts (e.g. quoted reply chains) are only scanned this far
+MAX_SCAN_CHARS = 65536
+
+# What an event source delivers; sender for email, contact for WhatsApp
+Message = namedtuple("Message", "kind sender contact subject text", defaults=(None, None, "", ""))
+
+# Per armed task: its event kind, its _by_address key (None if not addressed),
+# keywords, the contact still to check (sender-keyed tasks) and the owner
+_Entry = namedtuple("_Entry", "kind key keywords contact user_id")
+
+_lock = threading.RLock()
+_loaded = False
+_loaded_at = 0.0
+
+_entries = {}       # task_id -> _Entry
+_by_address = {}    # (kind, field, address) -> set(task_id)
+_by_keyword = {}    # keyword -> {kind: set(task_id)}, tasks filtered by keyword only
+_catch_all = {}     # kind -> set(task_id), tasks without any filter
+_keyword_refs = {}  # keyword -> number of tasks using it
+_by_user = {}       # user_id -> set(task_id)
+_automaton = None   # rebuilt lazily when the keyword set changed
+
+_match_seconds = metrics.histogram(
+    "event_match_seconds", "Time to match one message against the armed tasks",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+)
+
+
+# -------------------------------
+# Normalization
+# -------------------------------
+def normalize_text(text):
+    return " ".join((text or "").split()).casefold()
+
+
+def normalize_sender(value):
+    return parseaddr(value or "")[1].strip().casefold() or None
+
+
+def normalize_contact(value):
+    value = (value or "").strip()
+    digits = re.sub(r"\D", "", value)
+    # "+91 98765-43210" and "919876543210" are the same contact
+    if digits and len(digits) >= len(re.sub(r"[\s()+\-.]", "", value)):
+        return digits
+    return normalize_text(value) or None
+
+
+def split_keywords(value):
+    return tuple(dict.fromkeys(k for k in (normalize_text(p) for p in (value or "").split(",")) if k))
+
+
+# -------------------------------
+# Keyword automaton (Aho-Corasick)
+# -------------------------------
+class KeywordAutomaton:
+    """All keywords in one trie with failure links; search() is one pass over the text."""
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for keyword in keywords:
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] = self._out[state] + (keyword,)
+
+        # Breadth-first so a state's failure target is final before its children's
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, text):
+        """Keywords occurring in text (already normalized) as whole words."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        length = len(text)
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword in out[state]:
+                if keyword in found:
+                    continue
+                start = end - len(keyword)
+                if (start == 0 or not text[start - 1].isalnum()) and (end == length or not text[end].isalnum()):
+                    found.add(keyword)
+        return found
+
+
+def _get_automaton():
+    global _automaton
+    if _automaton is None:
+        _automaton = KeywordAutomaton(_keyword_refs)
+    return _automaton
+
+
+# -------------------------------
+# Index maintenance
+# -------------------------------
+def _discard(task_id):
+    global _automaton
+    entry = _entries.pop(task_id, None)
+    if entry is None:
+        return
+    owned = _by_user.get(entry.user_id)
+    if owned is not None:
+        owned.discard(task_id)
+        if not owned:
+            del _by_user[entry.user_id]
+    if entry.key is not None:
+        bucket = _by_address.get(entry.key)
+        if bucket is not None:
+            bucket.discard(task_id)
+            if not bucket:
+                del _by_address[entry.key]
+    elif entry.keywords:
+        for keyword in entry.keywords:
+            kinds = _by_keyword.get(keyword)
+            if kinds is None:
+                continue
+            ids = kinds.get(entry.kind)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del kinds[entry.kind]
+            if not kinds:
+                del _by_keyword[keyword]
+    else:
+        bucket = _catch_all.get(entry.kind)
+        if bucket is not None:
+            bucket.discard(task_id)
+    for keyword in entry.keywords:
+        _keyword_refs[keyword] -= 1
+        if not _keyword_refs[keyword]:
+            del _keyword_refs[keyword]
+            _automaton = None
+
+
+def _place(task_id, user_id, kind, sender, contact, keyword):
+    global _automaton
+    kind = (kind or "").strip().lower()
+    sender = normalize_sender(sender)
+    contact = normalize_contact(contact)
+    keywords = split_keywords(keyword)
+    if sender:
+        key, contact_check = (kind, "sender", sender), contact
+    elif contact:
+        key, contact_check = (kind, "contact", contact), None
+    else:
+        key, contact_check = None, None
+
+    _entries[task_id] = _Entry(kind, key, keywords, contact_check, user_id)
+    _by_user.setdefault(user_id, set()).add(task_id)
+    if key is not None:
+        _by_address.setdefault(key, set()).add(task_id)
+    elif keywords:
+        for k in keywords:
+            _by_keyword.setdefault(k, {}).setdefault(kind, set()).add(task_id)
+    else:
+        _catch_all.setdefault(kind, set()).add(task_id)
+    for k in keywords:
+        if k not in _keyword_refs:
+            _keyword_refs[k] = 0
+            _automaton = None
+        _keyword_refs[k] += 1
+
+
+def _armed(task):
+    return bool(task.enabled and task.notify_enabled and task.event_type)
+
+
+def load():
+    """(Re)build the whole index from the DB. Needs an app context."""
+    global _loaded, _loaded_at, _automaton
+    rows = (
+        Task.query
+        .with_entities(Task.id, Task.user_id, Task.event_type, Task.event_sender,
+                       Task.event_contact, Task.event_keyword)
+        .filter(Task.enabled.is_(True), Task.notify_enabled.is_(True), Task.event_type.isnot(None))
+        .all()
+    )
+    with _lock:
+        for table in (_entries, _by_address, _by_keyword, _catch_all, _keyword_refs, _by_user):
+            table.clear()
+        _automaton = None
+        for row in rows:
+            _place(*row)
+        _loaded_at = time.monotonic()
+        _loaded = True
+    return len(_entries)
+
+
+def ensure_loaded(max_age=0):
+    """Load on first use; with max_age > 0 rebuild once older than that (other workers' edits)."""
+    if not _loaded or (max_age and time.monotonic() - _loaded_at > max_age):
+        load()
+
+
+def upsert(task):
+    """Insert/refresh a task after it was added or edited (drops it if no longer armed)."""
+    with _lock:
+        _discard(task.id)
+        if _armed(task):
+            _place(task.id, task.user_id, task.event_type, task.event_sender,
+                   task.event_contact, task.event_keyword)
+
+
+def remove(task_id):
+    with _lock:
+        _discard(task_id)
+
+
+def remove_user(user_id):
+    with _lock:
+        for task_id in list(_by_user.get(user_id, ())):
+            _discard(task_id)
+
+
+# -------------------------------
+# Matching
+# -------------------------------
+def match(message):
+    """Ids of the armed tasks that message (a Message) triggers, sorted."""
+    started = time.perf_counter()
+    kind = (message.kind or "").strip().lower()
+    sender = normalize_sender(message.sender)
+    contact = normalize_contact(message.contact)
+    text = normalize_text(f"{message.subject or ''}\n{message.text or ''}"[:MAX_SCAN_CHARS])
+
+    with _lock:
+        hits = _get_automaton().search(text) if _keyword_refs and text else set()
+        matched = set(_catch_all.get(kind, ()))
+        for key in ((kind, "sender", sender), (kind, "contact", contact)):
+            for task_id in _by_address.get(key, ()):
+                entry = _entries[task_id]
+                if entry.contact is not None and entry.contact != contact:
+                    continue
+                if entry.keywords and hits.isdisjoint(entry.keywords):
+                    continue
+                matched.add(task_id)
+        for keyword in hits:
+            matched.update(_by_keyword.get(keyword, {}).get(kind, ()))
+
+    _match_seconds.observe(time.perf_counter() - started)
+    return sorted(matched)
+
+
+def size():
+    return len(_entries)
+
+
+@metrics.collector
+def _collect():
+    with _lock:
+        armed, keywords = len(_entries), len(_keyword_refs)
+    yield ("event_index_tasks", "gauge", "Armed event-trigger tasks in the index", (), [((), armed)])
+    yield ("event_index_keywords", "gauge", "Distinct keywords in the matching automaton", (), [((), keywords)])
@@ -0,0 +1,231 @@
+# app/event_sources.py
+"""
+Incoming-message ingestion for event-trigger tasks.
+
+A source turns some inbox into event_index.Message objects; poll() returns
+the messages that arrived since the previous call. Built in, as local
+stand-ins until real connectors (IMAP, WhatsApp Business API) are added:
+
+- "mbox:<path>"   a Unix mailbox, read for new messages (email)
+- "jsonl:<path>"  one JSON object per line, e.g.
+                  {"type": "whatsapp", "contact": "+91 98765 43210", "text": "..."}
+
+Other backends register with register_source(name, factory), where the
+factory may also be a "module:function" string imported on first use.
+EVENT_SOURCES lists the sources to follow ("mbox:/var/mail/me,jsonl:wa.jsonl");
+the scheduler leader polls them every EVENT_POLL_SECONDS, matches each
+message through event_index and hands matching tasks to task_runner.
+Read positions live in memory, so after a restart a source starts from its
+current end instead of replaying old mail.
+"""
+import json
+import logging
+import mailbox
+import os
+import threading
+from email.header import decode_header, make_header
+from importlib import import_module
+
+from app import event_index, metrics
+from app.event_index import Message
+
+log = logging.getLogger(__name__)
+
+POLL_SECONDS = 10.0
+INDEX_MAX_AGE = 0
+
+_sources = []
+_thread = None
+_stop = None  # threading.Event of the running loop
+_lock = threading.Lock()
+
+_messages_total = metrics.counter("event_messages_total", "Messages ingested by source type", ("source",))
+_matches_total = metrics.counter("event_matches_total", "Event-trigger tasks fired by incoming messages")
+
+
+# -------------------------------
+# Sources
+# -------------------------------
+def _decode(value):
+    try:
+        return str(make_header(decode_header(value or "")))
+    except (LookupError, UnicodeDecodeError, ValueError):
+        return value or ""
+
+
+def _plain_text(msg):
+    """The text/plain body of an email (first such part), decoded."""
+    parts = msg.walk() if msg.is_multipart() else [msg]
+    for part in parts:
+        if part.get_content_type() == "text/plain" and not part.get_filename():
+            payload = part.get_payload(decode=True) or b""
+            return payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+    return ""
+
+
+class MboxSource:
+    """New messages appended to a Unix mbox file."""
+
+    name = "mbox"
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self._seen = 0 if from_start else self._count()
+
+    def _count(self):
+        if not os.path.exists(self.path):
+            return 0
+        box = mailbox.mbox(self.path, create=False)
+        try:
+            return len(box)
+        finally:
+            box.close()
+
+    def poll(self):
+        if not os.path.exists(self.path):
+            return []
+        box = mailbox.mbox(self.path, create=False)
+        try:
+            keys = box.keys()
+            if len(keys) < self._seen:  # truncated/rotated: start over
+                self._seen = 0
+            messages = []
+            for key in keys[self._seen:]:
+                msg = box.get_message(key)
+                messages.append(Message(
+                    kind=event_index.EMAIL,
+                    sender=_decode(msg.get("From")),
+                    subject=_decode(msg.get("Subject")),
+                    text=_plain_text(msg),
+                ))
+            self._seen = len(keys)
+            return messages
+        finally:
+            box.close()
+
+
+class JsonlSource:
+    """JSON objects appended one per line to a file (type, sender/contact, subject, text)."""
+
+    name = "jsonl"
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self._offset = 0 if from_start or not os.path.exists(path) else os.path.getsize(path)
+
+    def poll(self):
+        if not os.path.exists(self.path):
+            return []
+        if os.path.getsize(self.path) < self._offset:
+            self._offset = 0
+        messages = []
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # partially written line: read it next time
+                self._offset += len(raw)
+                try:
+                    data = json.loads(raw)
+                except ValueError:
+                    log.warning("⚠️ Skipping malformed line in %s", self.path)
+                    continue
+                messages.append(Message(
+                    kind=data.get("type") or event_index.WHATSAPP,
+                    sender=data.get("sender"),
+                    contact=data.get("contact"),
+                    subject=data.get("subject") or "",
+                    text=data.get("text") or "",
+                ))
+        return messages
+
+
+_factories = {"mbox": MboxSource, "jsonl": JsonlSource}
+
+
+def register_source(name, factory):
+    """Add a source type; factory(path) -> object with poll(). May be a "module:function" string."""
+    _factories[name] = factory
+
+
+def open_source(spec, from_start=False):
+    """Build a source from "type:path". Raises ValueError for an unknown type."""
+    kind, _, path = spec.partition(":")
+    factory = _factories.get(kind.strip())
+    if factory is None:
+        raise ValueError(f"unknown event source type: {kind!r}")
+    if isinstance(factory, str):
+        module, _, attr = factory.partition(":")
+        factory = _factories[kind.strip()] = getattr(import_module(module), attr)
+    return factory(path.strip(), from_start=from_start)
+
+
+# -------------------------------
+# Ingestion
+# -------------------------------
+def ingest(messages, fire):
+    """Match messages against the index and call fire(task_id) per match. Returns the match count."""
+    fired = 0
+    for message in messages:
+        for task_id in event_index.match(message):
+            fire(task_id)
+            fired += 1
+    return fired
+
+
+def poll_once(app, fire):
+    """One pass over every configured source."""
+    with app.app_context():
+        event_index.ensure_loaded(INDEX_MAX_AGE)
+    fired = 0
+    for source in _sources:
+        try:
+            messages = source.poll()
+        except Exception as e:
+            log.warning("⚠️ Event source %s failed: %s", getattr(source, "path", source), e)
+            continue
+        _messages_total.inc(len(messages), source=getattr(source, "name", type(source).__name__))
+        fired += ingest(messages, fire)
+    if fired:
+        _matches_total.inc(fired)
+        log.info("📨 %d event-trigger task(s) matched incoming messages", fired)
+    return fired
+
+
+def start(app, fire):
+    """Follow EVENT_SOURCES on a background thread (leader only). No-op without sources."""
+    global _thread, _stop, POLL_SECONDS, INDEX_MAX_AGE
+    specs = [s for s in (app.config.get("EVENT_SOURCES") or "").split(",") if s.strip()]
+    POLL_SECONDS = app.config.get("EVENT_POLL_SECONDS", POLL_SECONDS)
+    INDEX_MAX_AGE = app.config.get("EVENT_INDEX_MAX_AGE", INDEX_MAX_AGE)
+    with _lock:
+        if _thread is not None or not specs:
+            return
+        for spec in specs:
+            try:
+                _sources.append(open_source(spec))
+            except ValueError as e:
+                log.warning("⚠️ %s", e)
+
+        stop = _stop = threading.Event()
+
+        def _loop():
+            while not stop.wait(POLL_SECONDS):
+                try:
+                    poll_once(app, fire)
+                except Exception:
+                    log.exception("⚠️ Event ingestion pass failed")
+
+        _thread = threading.Thread(target=_loop, name="event-ingest", daemon=True)
+        _thread.start()
+    log.info("📥 Following %d event source(s) every %ss", len(_sources), POLL_SECONDS)
+
+
+def stop():
+    """Stop following sources (the process is no longer the leader); start() may run again."""
+    global _thread, _stop
+    with _lock:
+        if _stop is not None:
+            _stop.set()
+        _thread = _stop = None
+        _sources.clear()
@@ -0,0 +1,118 @@
+# app/firing_ledger.py
+"""
+Restart-safe record of which (task_id, scheduled_for) slots have fired.
+
+The task_firings table is the source of truth (unique on task + slot, so
+concurrent claimers cannot both win). A bounded LRU of recently seen
+slots sits in front of it so repeated checks for the same slot never
+reach the DB. Both sides expire entries after the TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import TaskFiring
+
+TTL_HOURS = 48
+CACHE_SIZE = 50_000
+
+_cache = OrderedDict()  # (task_id, scheduled_for) -> monotonic expiry
+_lock = threading.Lock()
+
+
+def configure(app):
+    global TTL_HOURS, CACHE_SIZE
+    TTL_HOURS = app.config.get("FIRING_LEDGER_TTL_HOURS", TTL_HOURS)
+    CACHE_SIZE = app.config.get("FIRING_CACHE_SIZE", CACHE_SIZE)
+
+
+# -------------------------------
+# In-memory LRU
+# -------------------------------
+def _seen(key):
+    with _lock:
+        expiry = _cache.get(key)
+        if expiry is None:
+            return False
+        if expiry < time.monotonic():
+            del _cache[key]
+            return False
+        _cache.move_to_end(key)
+        return True
+
+
+def _remember(keys):
+    expiry = time.monotonic() + TTL_HOURS * 3600
+    with _lock:
+        for key in keys:
+            _cache[key] = expiry
+            _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+# -------------------------------
+# Claiming slots
+# -------------------------------
+def claim_many(slots):
+    """
+    Try to claim (task_id, scheduled_for) slots. Returns the set of slots this
+    process won; slots already in the ledger are skipped. Needs an app context.
+    """
+    fresh = list(dict.fromkeys(key for key in slots if not _seen(key)))
+    if not fresh:
+        return set()
+
+    now = datetime.utcnow()
+    rows = [{"task_id": t, "scheduled_for": s, "fired_at": now} for t, s in fresh]
+    dialect = db.engine.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = (
+            insert(TaskFiring.__table__)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["task_id", "scheduled_for"])
+            .returning(TaskFiring.task_id, TaskFiring.scheduled_for)
+        )
+        claimed = {(r.task_id, r.scheduled_for) for r in db.session.execute(stmt)}
+    else:
+        claimed = set()
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(TaskFiring.__table__.insert(), row)
+                claimed.add((row["task_id"], row["scheduled_for"]))
+            except IntegrityError:
+                pass
+    db.session.commit()
+
+    _remember(fresh)
+    return claimed
+
+
+def claim(task_id, scheduled_for):
+    return (task_id, scheduled_for) in claim_many([(task_id, scheduled_for)])
+
+
+def forget(task_id):
+    """Drop a task's history (e.g. after an edit re-arms it). Caller commits."""
+    with _lock:
+        for key in [k for k in _cache if k[0] == task_id]:
+            del _cache[key]
+    TaskFiring.query.filter_by(task_id=task_id).delete(synchronize_session=False)
+
+
+def prune():
+    """Delete ledger rows older than the TTL. Needs an app context."""
+    cutoff = datetime.utcnow() - timedelta(hours=TTL_HOURS)
+    removed = TaskFiring.query.filter(TaskFiring.fired_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
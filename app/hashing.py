@@ -0,0 +1,107 @@
+# app/hashing.py
+"""
+bcrypt off the request thread.
+
+Hashing is CPU-bound for ~0.1-0.3s at the default work factor. Under
+eventlet (run_prod.py monkey-patches) running it inline blocks the hub, so
+every socket and poll served by the worker stalls during a login burst.
+Here it runs on real OS threads instead: eventlet.tpool when eventlet is
+patched in, a plain ThreadPoolExecutor otherwise (bcrypt releases the GIL).
+
+At most HASH_MAX_PENDING hashes may be queued or running; callers that
+cannot get a slot within HASH_QUEUE_TIMEOUT get HashingBusy, which the
+auth routes turn into a "try again" response instead of piling up.
+"""
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import bcrypt, metrics
+
+WORKERS = 4
+MAX_PENDING = 64
+QUEUE_TIMEOUT = 5.0
+OFFLOAD = True
+
+_executor = None
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+_lock = threading.Lock()
+
+stats = {"hashed": 0, "checked": 0, "busy": 0}
+
+
+class HashingBusy(Exception):
+    """Too many password hashes queued; the caller should retry later."""
+
+
+def configure(app):
+    global WORKERS, MAX_PENDING, QUEUE_TIMEOUT, OFFLOAD, _slots, _executor
+    WORKERS = app.config.get("HASH_WORKERS", WORKERS)
+    MAX_PENDING = app.config.get("HASH_MAX_PENDING", MAX_PENDING)
+    QUEUE_TIMEOUT = app.config.get("HASH_QUEUE_TIMEOUT", QUEUE_TIMEOUT)
+    OFFLOAD = app.config.get("HASH_OFFLOAD", OFFLOAD)
+    with _lock:
+        _slots = threading.BoundedSemaphore(MAX_PENDING)
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+    if OFFLOAD and _eventlet_patched():
+        # Takes effect if tpool has not started its threads yet
+        from eventlet import tpool
+        tpool.set_num_threads(WORKERS)
+
+
+def _eventlet_patched():
+    # Only true if something (run_prod.py) already imported and patched
+    # eventlet; never import it just to ask
+    patcher = sys.modules.get("eventlet.patcher")
+    return patcher is not None and patcher.is_monkey_patched("thread")
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="bcrypt")
+        return _executor
+
+
+def _run(fn, *args):
+    if not OFFLOAD:
+        return fn(*args)
+    slots = _slots
+    if not slots.acquire(timeout=QUEUE_TIMEOUT):
+        stats["busy"] += 1
+        raise HashingBusy()
+    try:
+        if _eventlet_patched():
+            # Real OS threads (HASH_WORKERS of them); the calling green
+            # thread yields to the hub until the result is ready
+            from eventlet import tpool
+            return tpool.execute(fn, *args)
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        slots.release()
+
+
+# -------------------------------
+# API (auth_service)
+# -------------------------------
+def generate_password_hash(password):
+    """bcrypt hash (str) at BCRYPT_LOG_ROUNDS. May raise HashingBusy."""
+    hashed = _run(bcrypt.generate_password_hash, password)
+    stats["hashed"] += 1
+    return hashed.decode("utf-8")
+
+
+def check_password_hash(pw_hash, password):
+    """May raise HashingBusy."""
+    ok = _run(bcrypt.check_password_hash, pw_hash, password)
+    stats["checked"] += 1
+    return ok
+
+
+@metrics.collector
+def _collect():
+    yield ("password_hash_operations_total", "counter", "bcrypt hashes/checks, and requests refused as busy",
+           ("op",), [((key,), value) for key, value in stats.items()])
@@ -0,0 +1,205 @@
+# app/leader.py
+"""
+Leader election so only one process runs the scheduler.
+
+- PostgreSQL: a session-level pg_try_advisory_lock held on a dedicated
+  connection for the life of the process. Needs a session-mode pooler
+  (Supabase :5432) or a direct connection; transaction-mode poolers
+  do not keep session locks.
+- Anything else (SQLite, tests, local dev, DB_POOL_MODE=transaction): an
+  exclusive lock on a file, which only coordinates workers on one host.
+
+Processes that lose the election retry in the background, so a new
+leader takes over when the old one exits. The advisory lock lives only as
+long as its connection, so a PostgreSQL leader re-checks it every
+LEADER_CHECK_SECONDS; if the connection is gone it stops the scheduler
+(on_lost) and goes back to electing rather than firing alongside the
+process that took the lock.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import text
+
+from app import db
+
+log = logging.getLogger(__name__)
+
+# Arbitrary 64-bit key shared by every worker of this app
+ADVISORY_LOCK_KEY = 0x7A5C5C4ED
+
+_state = {"leader": False, "attempted": False, "backend": None}
+_lock = threading.Lock()
+_held = None  # connection or file object that keeps the lock alive
+
+
+def is_leader():
+    return _state["leader"]
+
+
+def attempted():
+    return _state["attempted"]
+
+
+# -------------------------------
+# Lock backends
+# -------------------------------
+def _try_pg_lock():
+    global _held
+    conn = db.engine.connect()
+    got = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}).scalar()
+    if got:
+        conn.commit()  # end the implicit transaction; the session lock stays
+        _held = conn
+    else:
+        conn.close()
+    return bool(got)
+
+
+def _pg_lock_held():
+    """True while _held still holds the advisory lock (raises if the connection is gone)."""
+    held = _held.execute(
+        text(
+            "SELECT count(*) FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid()"
+            " AND granted AND classid::bigint = :high AND objid::bigint = :low AND objsubid = 1"
+        ),
+        {"high": ADVISORY_LOCK_KEY >> 32, "low": ADVISORY_LOCK_KEY & 0xFFFFFFFF},
+    ).scalar()
+    _held.rollback()  # no open transaction between checks; the session lock stays
+    return bool(held)
+
+
+def _release():
+    global _held
+    held, _held = _held, None
+    if held is not None:
+        try:
+            held.close()
+        except Exception:
+            pass
+
+
+def _try_file_lock(path):
+    global _held
+    handle = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    _held = handle
+    return True
+
+
+def _try_acquire(app):
+    with app.app_context():
+        transaction_pooler = app.config.get("DB_POOL_MODE") == "transaction"
+        if db.engine.dialect.name == "postgresql" and not transaction_pooler:
+            _state["backend"] = "pg_advisory_lock"
+            return _try_pg_lock()
+    _state["backend"] = "file_lock"
+    path = app.config.get("SCHEDULER_LOCK_FILE") or os.path.join(tempfile.gettempdir(), "task_scheduler.lock")
+    return _try_file_lock(path)
+
+
+# -------------------------------
+# Election
+# -------------------------------
+def elect(app, on_elected, on_lost=None, background=False):
+    """
+    Try to become the scheduler leader; call on_elected(app) when we do, and
+    on_lost() if a PostgreSQL lock is lost later on.
+    Only the first call per process does anything. With background=True the
+    attempt (and on_elected, i.e. the scheduler bootstrap) runs on a thread
+    and this returns False at once.
+    """
+    with _lock:
+        if _state["attempted"]:
+            return _state["leader"]
+        _state["attempted"] = True
+
+    elected = None if background else _become_leader(app, on_elected)
+    threading.Thread(target=_elect_loop, args=(app, on_elected, on_lost, elected),
+                     name="leader-election", daemon=True).start()
+    return bool(elected)
+
+
+def _elect_loop(app, on_elected, on_lost, elected):
+    """
+    Election thread: try (unless elected is already known), retry while
+    another process leads, and while leading watch the advisory lock,
+    stepping down and starting over if it is lost.
+    """
+    try:
+        if elected is None:
+            elected = _become_leader(app, on_elected)
+        while True:
+            if not elected:
+                _retry_loop(app, on_elected)
+            if _state["backend"] != "pg_advisory_lock":
+                return  # a file lock lasts as long as the process
+            _watch_loop(app)
+            _step_down(on_lost)
+            elected = False
+    except Exception:
+        log.exception("⚠️ Scheduler bootstrap failed")
+
+
+def _retry_loop(app, on_elected):
+    retry = app.config.get("LEADER_RETRY_SECONDS", 30)
+    log.info("⏸️ Another process holds the scheduler lock, retrying every %ss", retry)
+    while True:
+        time.sleep(retry)
+        if _become_leader(app, on_elected):
+            return
+
+
+def _watch_loop(app):
+    """Return once the advisory lock is no longer held (also keeps its connection from idling out)."""
+    interval = app.config.get("LEADER_CHECK_SECONDS", 15)
+    while True:
+        time.sleep(interval)
+        try:
+            if _pg_lock_held():
+                continue
+            reason = "lock not held"
+        except Exception as e:
+            reason = e
+        log.warning("⚠️ Lost the scheduler lock (%s), stepping down", reason)
+        return
+
+
+def _step_down(on_lost):
+    _state["leader"] = False
+    _release()
+    if on_lost is not None:
+        try:
+            on_lost()
+        except Exception:
+            log.exception("⚠️ Stopping the scheduler after losing the lock failed")
+
+
+def _become_leader(app, on_elected):
+    try:
+        got = _try_acquire(app)
+    except Exception as e:
+        log.warning("⚠️ Leader election failed: %s", e)
+        return False
+    if got:
+        _state["leader"] = True
+        log.info("👑 This process is the scheduler leader (%s, pid %s)", _state["backend"], os.getpid())
+        on_elected(app)
+    return got
@@ -0,0 +1,138 @@
+# app/metrics.py
+"""
+Minimal in-process metrics registry rendered as Prometheus text (/metrics).
+
+Counters and histograms are updated on the hot paths (cheap: a lock and a
+dict update). Gauges and the counters kept by other modules (notifier,
+presence, db pool, user cache, hashing) are read through callbacks only
+when /metrics is scraped. Values are per process.
+"""
+import bisect
+import threading
+
+_lock = threading.Lock()
+_metrics = {}    # name -> metric, in registration order
+_collectors = []  # callables yielding (name, type, help, [(labels, value), ...])
+
+# Seconds; request latencies and job durations share these
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with _lock:
+            return [(self.name, self.labelnames, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with _lock:
+            self._values[key] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def samples(self):
+        names = self.labelnames + ("le",)
+        out = []
+        with _lock:
+            rows = [(key, list(row)) for key, row in self._values.items()]
+        for key, row in rows:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                out.append((f"{self.name}_bucket", names, key + (le,), cumulative))
+            out.append((f"{self.name}_count", self.labelnames, key, cumulative))
+            out.append((f"{self.name}_sum", self.labelnames, key, row[-1]))
+        return out
+
+
+# -------------------------------
+# Registry
+# -------------------------------
+def _register(metric):
+    with _lock:
+        existing = _metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        _metrics[metric.name] = metric
+        return metric
+
+
+def counter(name, help_text, labelnames=()):
+    return _register(Counter(name, help_text, labelnames))
+
+
+def gauge(name, help_text, labelnames=()):
+    return _register(Gauge(name, help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, help_text, labelnames, buckets))
+
+
+def collector(fn):
+    """
+    Register fn() -> iterable of (name, type, help, labelnames, [(label_values, value)])
+    to be called at scrape time. Usable as a decorator.
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    lines = []
+    for metric in list(_metrics.values()):
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labelnames, values, value in metric.samples():
+            lines.append(f"{name}{_label_text(labelnames, values)} {value}")
+    for fn in _collectors:
+        for name, kind, help_text, labelnames, rows in fn():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for values, value in rows:
+                lines.append(f"{name}{_label_text(labelnames, values)} {value}")
+    return "\n".join(lines) + "\n"
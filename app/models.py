@@ -2,6 +2,18 @@
 from datetime import datetime, date
 from app import db
 from flask_login import UserMixin
+from sqlalchemy.orm import validates
+
+def parse_minute_of_day(time_str):
+    """Convert "HH:MM" into minutes since midnight, or None if invalid."""
+    try:
+        hour, minute = map(int, (time_str or "").split(":"))
+    except ValueError:
+        return None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return hour * 60 + minute
+
 
 # -------------------------------
 # User model
@@ -12,13 +24,18 @@ class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
+    # IANA name (e.g. "Europe/Berlin"); None means the TIMEZONE setting
+    timezone = db.Column(db.String(64), nullable=True)
 
     # One-to-many relationship: User → Tasks
+    # passive_deletes: deleting a user leaves the tasks to ON DELETE CASCADE
+    # instead of loading and deleting them row by row
     tasks = db.relationship(
         "Task",
         backref="owner",
         lazy=True,
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     def __repr__(self):
@@ -41,12 +58,19 @@ class Task(db.Model):
     """
 
     __tablename__ = "tasks"
+    __table_args__ = (
+        # keyset pagination of a user's task list
+        db.Index("ix_tasks_user_created_id", "user_id", "created_at", "id"),
+        # dispatcher range scan: enabled tasks due before T
+        db.Index("ix_tasks_enabled_next_fire", "enabled", "next_fire_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
     # Basic fields
     title = db.Column(db.String(200), nullable=False)
     time = db.Column(db.String(10), nullable=True)  # "HH:MM" string
+    minute_of_day = db.Column(db.SmallInteger, nullable=True)  # derived from time, 0..1439
     action = db.Column(db.String(500), nullable=True)
 
     # Notification & channels
@@ -63,14 +87,17 @@ class Task(db.Model):
     date_window_start = db.Column(db.Date, nullable=True)
     date_window_end = db.Column(db.Date, nullable=True)
 
-    # Recurrence rules
+    # Recurrence rules (see app/recurrence.py)
     repeat_rule = db.Column(db.String(50), nullable=False, default="one-time")
+    # Next occurrence as naive UTC (time/date window are the owner's local time),
+    # advanced after each firing
+    next_fire_at = db.Column(db.DateTime, nullable=True)
 
     # Flags & metadata
     enabled = db.Column(db.Boolean, default=True, nullable=False)
     notify_enabled = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     def __repr__(self):
         parts = [f"{self.title}"]
@@ -80,6 +107,12 @@ class Task(db.Model):
             parts.append(f"(trigger: {self.event_type})")
         return f"<Task {' '.join(parts)}>"
 
+    @validates("time")
+    def _sync_minute_of_day(self, key, value):
+        """Keep the indexed minute_of_day column in step with the "HH:MM" string."""
+        self.minute_of_day = parse_minute_of_day(value)
+        return value
+
     # -------------------------------
     # Utility methods
     # -------------------------------
@@ -117,8 +150,62 @@ class Task(db.Model):
             "date_window_start": self.date_window_start.isoformat() if self.date_window_start else None,
             "date_window_end": self.date_window_end.isoformat() if self.date_window_end else None,
             "repeat_rule": self.repeat_rule,
+            "next_fire_at": self.next_fire_at.isoformat() if self.next_fire_at else None,
             "enabled": self.enabled,
             "notify_enabled": self.notify_enabled,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "user_id": self.user_id,
         }
+
+
+# -------------------------------
+# Firing ledger model
+# -------------------------------
+class TaskFiring(db.Model):
+    """
+    One row per (task, scheduled slot) that has fired, so a reminder is
+    delivered once per slot across restarts and worker processes.
+    Rows older than FIRING_LEDGER_TTL_HOURS are pruned.
+    """
+
+    __tablename__ = "task_firings"
+    __table_args__ = (
+        db.UniqueConstraint("task_id", "scheduled_for", name="uq_task_firings_task_slot"),
+        db.Index("ix_task_firings_fired_at", "fired_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    scheduled_for = db.Column(db.DateTime, nullable=False)  # minute the task was due
+    fired_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<TaskFiring task={self.task_id} @ {self.scheduled_for}>"
+
+
+# -------------------------------
+# Notification outbox model
+# -------------------------------
+class OutboxItem(db.Model):
+    """
+    A socket notification for a user who was offline when it fired, spilled
+    from the in-memory outbox (see app/outbox.py) until the user rejoins.
+    task_id is not a foreign key: the reminder is still worth showing after
+    its task was deleted.
+    """
+
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        db.Index("ix_notification_outbox_user_id", "user_id", "id"),
+        db.Index("ix_notification_outbox_created_at", "created_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    task_id = db.Column(db.Integer, nullable=True)
+    title = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # when it fired
+
+    def __repr__(self):
+        return f"<OutboxItem user={self.user_id} task={self.task_id} @ {self.created_at}>"
@@ -0,0 +1,249 @@
+# app/notifier.py
+"""
+Notification delivery pipeline.
+
+The scheduler only enqueues events; a small pool of fan-out workers hands
+each event to its channels (socket, voice, and whatever is registered for
+the names in Task.channels). Every channel has its own executor, a cap on
+in-flight deliveries and a timeout after which a queued delivery is
+skipped, so one slow voice alert cannot hold up the socket pushes due in
+the same minute.
+
+Socket pushes are coalesced: notifications for one user arriving within
+NOTIFY_COALESCE_SECONDS (e.g. everything a dispatcher tick fires for that
+user) go out as a single "task_notifications" emit. Pushes for a user with
+no live socket go to the outbox (app/outbox.py) until the user rejoins.
+
+Channel backends may be given as "module:function" strings; they are
+imported on first delivery. Voice alerts go through app/voice.py (one TTS
+engine, cached clips), which imports pyttsx3 only when it first speaks.
+"""
+import logging
+import queue
+import threading
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import time
+from functools import lru_cache
+from importlib import import_module
+
+from app import metrics, outbox, voice
+
+log = logging.getLogger(__name__)
+
+Event = namedtuple("Event", "task_id user_id title body channels")
+Channel = namedtuple("Channel", "name handler executor slots timeout")
+
+DEFAULT_CHANNELS = ("socket", "voice")
+
+_events = None
+_channels = {}
+_workers = []
+_socketio = None
+_started = False
+_lock = threading.Lock()
+_enqueue_timeout = 0.5
+
+_coalesce_window = 1.0
+_pending = {}       # user_id -> [item, ...] waiting for the coalescing window
+_flush_order = deque()  # (deadline, user_id), deadlines in arrival order
+_pending_cond = threading.Condition()
+
+# Counters per "<metric>" or "<metric>:<channel>"
+stats = Counter()
+
+
+# -------------------------------
+# Channel handlers
+# -------------------------------
+def _send_socket(event):
+    if not _socketio:
+        return
+    item = {"id": event.task_id, "title": event.title, "body": event.body}
+    if _coalesce_window <= 0:
+        _emit(event.user_id, [item])
+        return
+    with _pending_cond:
+        items = _pending.get(event.user_id)
+        if items is None:
+            _pending[event.user_id] = [item]
+            _flush_order.append((time.monotonic() + _coalesce_window, event.user_id))
+            _pending_cond.notify()
+        else:
+            items.append(item)
+
+
+def _emit(user_id, items):
+    if outbox.offer(user_id, items):
+        return  # nobody connected: delivered as a batch on the next join_room
+    room = f"user_{user_id}"
+    if len(items) == 1:
+        _socketio.emit("task_notification", items[0], room=room)
+    else:
+        _socketio.emit("task_notifications", {"items": items}, room=room)
+    stats["pushes"] += 1
+    stats["pushed_items"] += len(items)
+    log.debug("📢 Emitted %d notification(s) to user %s", len(items), user_id)
+
+
+def _flush_loop():
+    """Emit each user's pending socket items once their window has passed."""
+    while True:
+        with _pending_cond:
+            while not _flush_order:
+                _pending_cond.wait()
+            deadline, user_id = _flush_order[0]
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                _pending_cond.wait(delay)
+                continue
+            _flush_order.popleft()
+            items = _pending.pop(user_id)
+        try:
+            _emit(user_id, items)
+        except Exception as e:
+            stats["failed:socket_emit"] += 1
+            log.warning("⚠️ Socket emit failed for user %s: %s", user_id, e)
+
+
+def _send_voice(event):
+    voice.alert(event.title, event.body)
+
+
+@lru_cache(maxsize=None)
+def _load_handler(path):
+    module, _, attr = path.partition(":")
+    return getattr(import_module(module), attr)
+
+
+def register_channel(name, handler, workers=2, max_pending=100, timeout=5.0):
+    """
+    Add (or replace) a delivery channel, e.g. "email" or "whatsapp". handler
+    is a callable or a "module:function" string imported on first use.
+    """
+    old = _channels.get(name)
+    _channels[name] = Channel(
+        name=name,
+        handler=handler,
+        executor=ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"notify-{name}"),
+        slots=threading.BoundedSemaphore(max_pending),
+        timeout=timeout,
+    )
+    if old:
+        old.executor.shutdown(wait=False)
+
+
+# -------------------------------
+# Lifecycle
+# -------------------------------
+def start(app, socketio=None):
+    """Create the queue, default channels and fan-out workers (idempotent)."""
+    global _events, _socketio, _started, _enqueue_timeout, _coalesce_window
+    if socketio:
+        _socketio = socketio
+    with _lock:
+        if _started:
+            return
+        cfg = app.config
+        _events = queue.Queue(maxsize=cfg.get("NOTIFY_QUEUE_SIZE", 1000))
+        _enqueue_timeout = cfg.get("NOTIFY_ENQUEUE_TIMEOUT", 0.5)
+        _coalesce_window = cfg.get("NOTIFY_COALESCE_SECONDS", _coalesce_window)
+        outbox.start(app)
+        register_channel("socket", _send_socket, workers=4, max_pending=500,
+                         timeout=cfg.get("NOTIFY_SOCKET_TIMEOUT", 2.0))
+        # One alert at a time; voice.py serializes on its single engine anyway
+        register_channel("voice", _send_voice, workers=1, max_pending=20,
+                         timeout=cfg.get("NOTIFY_VOICE_TIMEOUT", 15.0))
+        for i in range(cfg.get("NOTIFY_WORKERS", 2)):
+            worker = threading.Thread(target=_worker_loop, name=f"notify-fanout-{i}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+        flusher = threading.Thread(target=_flush_loop, name="notify-socket-flush", daemon=True)
+        flusher.start()
+        _workers.append(flusher)
+        _started = True
+
+
+def enqueue(task_id, user_id, title, body, channels=None):
+    """Queue a notification. Blocks briefly when full, then drops. Returns True if queued."""
+    title = title or "Reminder"
+    body = body or "You have a task!"
+    wanted = tuple(dict.fromkeys(DEFAULT_CHANNELS + tuple(channels or ())))
+    log.debug("🔔 %s: %s", title, body)
+
+    if _events is None:
+        log.warning("⚠️ Notifier not started, dropping notification")
+        stats["dropped"] += 1
+        return False
+    try:
+        _events.put(Event(task_id, user_id, title, body, wanted), timeout=_enqueue_timeout)
+    except queue.Full:
+        stats["dropped"] += 1
+        log.warning("⚠️ Notification queue full, dropped task %s", task_id)
+        return False
+    stats["enqueued"] += 1
+    return True
+
+
+def queue_depth():
+    return _events.qsize() if _events is not None else 0
+
+
+@metrics.collector
+def _collect():
+    events = [((key.partition(":")[0], key.partition(":")[2]), value) for key, value in stats.items()]
+    with _pending_cond:
+        pending = sum(len(items) for items in _pending.values())
+    yield ("notifier_queue_depth", "gauge", "Events waiting for a fan-out worker", (), [((), queue_depth())])
+    yield ("notifier_pending_socket_items", "gauge", "Socket items waiting for their coalescing window",
+           (), [((), pending)])
+    yield ("notifier_events_total", "counter",
+           "Notifier outcomes (enqueued, dropped, delivered, failed, expired, slow, overflow, pushes, ...)",
+           ("event", "channel"), events)
+
+
+# -------------------------------
+# Fan-out
+# -------------------------------
+def _worker_loop():
+    while True:
+        event = _events.get()
+        try:
+            _deliver(event)
+        finally:
+            _events.task_done()
+
+
+def _run(channel, event, submitted):
+    name = channel.name
+    try:
+        # Stale deliveries (stuck behind a slow handler) are skipped, not replayed late
+        if time.monotonic() - submitted > channel.timeout:
+            stats[f"expired:{name}"] += 1
+            return
+        handler = channel.handler
+        if isinstance(handler, str):
+            handler = _load_handler(handler)
+        started = time.monotonic()
+        handler(event)
+        stats[f"delivered:{name}"] += 1
+        if time.monotonic() - started > channel.timeout:
+            stats[f"slow:{name}"] += 1
+    except Exception as e:
+        stats[f"failed:{name}"] += 1
+        log.warning("⚠️ %s delivery failed for task %s: %s", name, event.task_id, e)
+    finally:
+        channel.slots.release()
+
+
+def _deliver(event):
+    """Route one event to its channels without waiting for them."""
+    for name in event.channels:
+        channel = _channels.get(name)
+        if channel is None:
+            stats[f"unrouted:{name}"] += 1
+            continue
+        if not channel.slots.acquire(blocking=False):
+            stats[f"overflow:{name}"] += 1
+            continue
+        channel.executor.submit(_run, channel, event, time.monotonic())
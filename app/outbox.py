@@ -0,0 +1,241 @@
+# app/outbox.py
+"""
+Per-user outbox for socket notifications nobody was connected to receive.
+
+An emit to a user_<id> room without sockets is simply lost, and the page
+used to make up for it by polling /check_notifications after reconnecting,
+which only sees tasks due in the current minute. Instead the notifier
+hands items for users without a live session (presence) to offer(); the
+join_room handler takes everything waiting and sends it as one
+"task_notifications" batch.
+
+Each user keeps up to OUTBOX_MEMORY_ITEMS in memory; beyond that the oldest
+are spilled in one insert to the notification_outbox table, which holds at
+most OUTBOX_MAX_ITEMS per user (oldest dropped). Entries older than
+OUTBOX_TTL_HOURS are not delivered. Whatever is still in memory is spilled
+at exit. A rejoin costs no query unless something was spilled for that user.
+Spills and the rejoin's table read run outside the outbox lock; a rejoin
+only waits for a spill of its own user that is already under way.
+
+Presence is per process, so the outbox is off by default with a Socket.IO
+message queue: the scheduler leader cannot tell whether another worker
+holds the user's socket.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from app import db, metrics, presence
+from app.models import OutboxItem
+
+log = logging.getLogger(__name__)
+
+ENABLED = True
+MEMORY_ITEMS = 20
+MAX_ITEMS = 200
+TTL_HOURS = 24
+
+_app = None
+# Guards the memory state below and is never held across DB work, so a
+# spill for one user does not hold up take() for another
+_lock = threading.Lock()
+_settled = threading.Condition(_lock)  # notified when a spill finishes
+_spill_lock = threading.Lock()         # one spill at a time, so the counts add up
+_boxes = {}            # user_id -> deque of (fired_at, item), oldest first
+_spilled = None        # user_id -> rows in the table; None until first counted
+_in_flight = Counter()  # user_id -> spills taken from memory, not yet committed
+
+# "stored", "spilled", "delivered", "expired", "dropped", "spill_failed"
+stats = Counter()
+
+
+def configure(app):
+    global ENABLED, MEMORY_ITEMS, MAX_ITEMS, TTL_HOURS
+    ENABLED = app.config.get("OUTBOX_ENABLED", ENABLED)
+    MEMORY_ITEMS = max(1, app.config.get("OUTBOX_MEMORY_ITEMS", MEMORY_ITEMS))
+    MAX_ITEMS = max(MEMORY_ITEMS, app.config.get("OUTBOX_MAX_ITEMS", MAX_ITEMS))
+    TTL_HOURS = app.config.get("OUTBOX_TTL_HOURS", TTL_HOURS)
+
+
+def start(app):
+    """Give the outbox an app for spilling from notifier threads (idempotent)."""
+    global _app
+    if _app is None:
+        atexit.register(spill_all)
+    _app = app
+
+
+# -------------------------------
+# Table side (caller has an app context and does not hold _lock)
+# -------------------------------
+def _counts():
+    global _spilled
+    if _spilled is None:
+        rows = db.session.query(OutboxItem.user_id, func.count()).group_by(OutboxItem.user_id).all()
+        with _lock:
+            if _spilled is None:
+                _spilled = {user_id: count for user_id, count in rows}
+    return _spilled
+
+
+def _spill(user_id, entries):
+    with _spill_lock:
+        counts = _counts()  # before the insert, which it would otherwise include
+        db.session.execute(OutboxItem.__table__.insert(), [
+            {"user_id": user_id, "task_id": item.get("id"), "title": item.get("title") or "Reminder",
+             "body": item.get("body"), "created_at": fired_at}
+            for fired_at, item in entries
+        ])
+        count = counts.get(user_id, 0) + len(entries)
+        keep = MAX_ITEMS - MEMORY_ITEMS
+        if count > keep:
+            stale = (
+                db.session.query(OutboxItem.id)
+                .filter(OutboxItem.user_id == user_id)
+                .order_by(OutboxItem.id.desc())
+                .offset(keep)
+                .scalar_subquery()
+            )
+            dropped = OutboxItem.query.filter(OutboxItem.id.in_(stale)).delete(synchronize_session=False)
+            stats["dropped"] += dropped
+            count -= dropped
+        db.session.commit()
+        with _lock:
+            counts[user_id] = count
+    stats["spilled"] += len(entries)
+
+
+def _spill_safely(user_id, entries):
+    """Spill entries taken from memory by the caller, which counted them in _in_flight."""
+    try:
+        if _app is None:
+            raise RuntimeError("outbox not started")
+        with _app.app_context():
+            _spill(user_id, entries)
+    except Exception as e:
+        stats["spill_failed"] += len(entries)
+        log.warning("⚠️ Outbox spill failed for user %s, dropped %d item(s): %s", user_id, len(entries), e)
+    finally:
+        with _lock:
+            _in_flight[user_id] -= 1
+            if not _in_flight[user_id]:
+                del _in_flight[user_id]
+            _settled.notify_all()
+
+
+# -------------------------------
+# Notifier / join_room
+# -------------------------------
+def offer(user_id, items):
+    """
+    Keep socket items for a user with no live session in this process.
+    Returns False (caller emits) when the user is online or the outbox is off.
+    """
+    if not ENABLED:
+        return False
+    spill = None
+    with _lock:
+        # Checked under the lock that take() holds, so an item is either
+        # emitted to a joined socket or still here when the join takes it
+        if presence.is_online(user_id):
+            return False
+        box = _boxes.setdefault(user_id, deque())
+        now = datetime.utcnow()
+        box.extend((now, item) for item in items)
+        stats["stored"] += len(items)
+        if len(box) > MEMORY_ITEMS:
+            # Spill down to half the bound so spills are batches, not single rows
+            spill = [box.popleft() for _ in range(len(box) - MEMORY_ITEMS // 2)]
+            _in_flight[user_id] += 1
+    if spill:
+        _spill_safely(user_id, spill)
+    log.debug("📭 Kept %d notification(s) for offline user %s", len(items), user_id)
+    return True
+
+
+def take(user_id):
+    """Remove and return everything waiting for user_id, oldest first. Needs an app context."""
+    if not ENABLED:
+        return []
+    with _lock:
+        # The user is online by now, so no new spill starts for them; one
+        # already under way is waited for (releasing _lock) so its rows are read
+        while _in_flight.get(user_id):
+            _settled.wait()
+        entries = list(_boxes.pop(user_id, ()))
+    counts = _counts()
+    if counts.get(user_id):
+        rows = (
+            db.session.query(OutboxItem.id, OutboxItem.task_id, OutboxItem.title,
+                             OutboxItem.body, OutboxItem.created_at)
+            .filter(OutboxItem.user_id == user_id)
+            .order_by(OutboxItem.id)
+            .all()
+        )
+        if rows:
+            OutboxItem.query.filter(OutboxItem.user_id == user_id, OutboxItem.id <= rows[-1].id)\
+                .delete(synchronize_session=False)
+            db.session.commit()
+        with _lock:
+            counts.pop(user_id, None)
+        entries = [(r.created_at, {"id": r.task_id, "title": r.title, "body": r.body}) for r in rows] + entries
+    cutoff = datetime.utcnow() - timedelta(hours=TTL_HOURS)
+    items = [dict(item, fired_at=fired_at.isoformat()) for fired_at, item in entries if fired_at >= cutoff]
+    stats["expired"] += len(entries) - len(items)
+    stats["delivered"] += len(items)
+    return items
+
+
+# -------------------------------
+# Housekeeping
+# -------------------------------
+def prune():
+    """Forget entries older than the TTL, in memory and in the table. Needs an app context."""
+    global _spilled
+    cutoff = datetime.utcnow() - timedelta(hours=TTL_HOURS)
+    expired = 0
+    with _lock:
+        for user_id in list(_boxes):
+            box = _boxes[user_id]
+            while box and box[0][0] < cutoff:
+                box.popleft()
+                expired += 1
+            if not box:
+                del _boxes[user_id]
+    removed = OutboxItem.query.filter(OutboxItem.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    if removed:
+        with _lock:
+            _spilled = None  # recounted on next use
+    stats["expired"] += expired + removed
+    return expired + removed
+
+
+def spill_all():
+    """Write every in-memory entry to the table (at exit, so a restart keeps them)."""
+    with _lock:
+        boxes = list(_boxes.items())
+        _boxes.clear()
+        _in_flight.update(user_id for user_id, _ in boxes)
+    for user_id, box in boxes:
+        _spill_safely(user_id, list(box))
+
+
+def size():
+    with _lock:
+        memory = sum(len(box) for box in _boxes.values())
+        table = sum(_spilled.values()) if _spilled is not None else 0
+    return memory, table
+
+
+@metrics.collector
+def _collect():
+    memory, table = size()
+    yield ("outbox_items", "gauge", "Undelivered notifications for offline users", ("store",),
+           [(("memory",), memory), (("table",), table)])
+    yield ("outbox_events_total", "counter", "Outbox items stored, spilled, delivered on rejoin, expired, dropped",
+           ("event",), [((key,), value) for key, value in stats.items()])
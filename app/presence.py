@@ -0,0 +1,143 @@
+# app/presence.py
+"""
+Live Socket.IO sessions per user, and push-vs-poll accounting.
+
+A tab that joined its user_<id> room gets notifications pushed and stops
+polling /check_notifications while the socket is connected (tasks.js), so
+every connected interval is a poll that never happened. Sessions are
+tracked per process: with several workers each one knows the sockets it
+serves.
+
+Tabs without a socket long-poll: /check_notifications parks the request
+until something is due (park()/unpark() bound how many wait at once).
+"""
+import threading
+import time
+from collections import Counter
+
+from app import metrics
+
+# Must match the client's fallback polling interval (POLL_INTERVAL_SECONDS)
+POLL_INTERVAL = 300
+MAX_PARKED = 1000
+
+_lock = threading.Lock()
+_sessions = {}          # user_id -> {sid: connected_at (monotonic)}
+_owners = {}            # sid -> user_id
+_closed_seconds = 0.0   # connected time of sessions that already ended
+_parked = 0             # long polls waiting right now
+
+# "polls" served, "polls_while_live" (polled although a socket was up),
+# "long_polls" parked, "long_polls_refused" (answered at once, MAX_PARKED hit),
+# "joins", "rejected_joins"
+stats = Counter()
+
+
+def configure(app):
+    global POLL_INTERVAL, MAX_PARKED
+    POLL_INTERVAL = app.config.get("POLL_INTERVAL_SECONDS", POLL_INTERVAL)
+    MAX_PARKED = app.config.get("LONGPOLL_MAX_WAITERS", MAX_PARKED)
+
+
+# -------------------------------
+# Sessions (Socket.IO handlers)
+# -------------------------------
+def joined(user_id, sid):
+    with _lock:
+        if sid in _owners:
+            return
+        _owners[sid] = user_id
+        _sessions.setdefault(user_id, {})[sid] = time.monotonic()
+    stats["joins"] += 1
+
+
+def left(sid):
+    global _closed_seconds
+    with _lock:
+        user_id = _owners.pop(sid, None)
+        if user_id is None:
+            return
+        sessions = _sessions.get(user_id, {})
+        connected_at = sessions.pop(sid, None)
+        if not sessions:
+            _sessions.pop(user_id, None)
+        if connected_at is not None:
+            _closed_seconds += time.monotonic() - connected_at
+
+
+def is_online(user_id):
+    return bool(_sessions.get(user_id))
+
+
+def online_users():
+    return len(_sessions)
+
+
+def online_sessions():
+    return len(_owners)
+
+
+# -------------------------------
+# Accounting
+# -------------------------------
+def record_poll(user_id):
+    stats["polls"] += 1
+    if is_online(user_id):
+        stats["polls_while_live"] += 1
+
+
+def park():
+    """Reserve a long-poll slot; False when MAX_PARKED requests already wait."""
+    global _parked
+    with _lock:
+        if _parked >= MAX_PARKED:
+            stats["long_polls_refused"] += 1
+            return False
+        _parked += 1
+    stats["long_polls"] += 1
+    return True
+
+
+def unpark():
+    global _parked
+    with _lock:
+        _parked -= 1
+
+
+def parked():
+    return _parked
+
+
+def polls_saved():
+    """Polling requests the connected sessions did not have to make (estimate)."""
+    now = time.monotonic()
+    with _lock:
+        live = sum(now - t for sessions in _sessions.values() for t in sessions.values())
+        seconds = _closed_seconds + live
+    return int(seconds // POLL_INTERVAL) if POLL_INTERVAL > 0 else 0
+
+
+def snapshot():
+    return {
+        "online_users": online_users(),
+        "online_sessions": online_sessions(),
+        "polls": stats["polls"],
+        "polls_while_live": stats["polls_while_live"],
+        "polls_saved": polls_saved(),
+        "long_polls": stats["long_polls"],
+        "long_polls_parked": parked(),
+        "joins": stats["joins"],
+        "rejected_joins": stats["rejected_joins"],
+    }
+
+
+@metrics.collector
+def _collect():
+    yield ("socket_online_users", "gauge", "Users with a live Socket.IO session", (), [((), online_users())])
+    yield ("socket_online_sessions", "gauge", "Live Socket.IO sessions", (), [((), online_sessions())])
+    yield ("socket_events_total", "counter", "Room joins and polls served", ("event",),
+           [((key,), stats[key]) for key in ("joins", "rejected_joins", "polls", "polls_while_live",
+                                             "long_polls", "long_polls_refused")])
+    yield ("long_polls_parked", "gauge", "/check_notifications requests waiting for a due task", (),
+           [((), parked())])
+    yield ("polls_saved_total", "counter", "Estimated polls avoided by live sockets", (), [((), polls_saved())])
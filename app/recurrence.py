@@ -0,0 +1,204 @@
+# app/recurrence.py
+"""
+Recurrence engine for Task.repeat_rule.
+
+Supported rules (case-insensitive):
+- "one-time", "daily", "weekly", "monthly", "weekdays", "weekends"
+- "every N days|weeks|months"
+- "every monday,wednesday" / "every mon wed"
+- RRULE-like: "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;UNTIL=20261231"
+  (FREQ DAILY|WEEKLY|MONTHLY, INTERVAL, BYDAY, BYMONTHDAY, UNTIL)
+
+Anything else keeps the historical behaviour of firing daily. Rules are
+parsed once (cached); next_fire_after() is what the scheduler stores in
+Task.next_fire_at and advances after every firing.
+
+Rules are evaluated in the owner's timezone (User.timezone, else the
+TIMEZONE setting) and the result is stored as naive UTC, so one dispatcher
+tick serves every zone. Across DST changes a wall-clock time skipped by the
+spring-forward jump fires at the same offset (02:30 -> 03:30), and a time
+repeated by the fall-back fires once, on its first occurrence.
+"""
+import re
+from collections import namedtuple
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+ONCE, DAILY, WEEKLY, MONTHLY = "once", "daily", "weekly", "monthly"
+
+# byday / bymonthday are frozensets, or None to use the task's anchor date
+Rule = namedtuple("Rule", "freq interval byday bymonthday until")
+
+WEEKDAYS = {"mo": 0, "tu": 1, "we": 2, "th": 3, "fr": 4, "sa": 5, "su": 6}
+_UNITS = {"day": DAILY, "week": WEEKLY, "month": MONTHLY}
+_EVERY_N_RE = re.compile(r"^every\s+(\d+)\s+(day|week|month)s?$")
+_EVERY_DAYS_RE = re.compile(r"^every\s+([a-z,\s]+)$")
+
+# Far enough to cover "every 12 months" with a narrow BYMONTHDAY
+MAX_SCAN_DAYS = 366 * 4
+
+DEFAULT_TIMEZONE = "Asia/Kolkata"
+
+
+def configure(app):
+    global DEFAULT_TIMEZONE
+    DEFAULT_TIMEZONE = app.config.get("TIMEZONE", DEFAULT_TIMEZONE)
+
+
+# -------------------------------
+# Timezones
+# -------------------------------
+@lru_cache(maxsize=None)
+def _zone(name):
+    return ZoneInfo(name)
+
+
+def is_valid_timezone(name):
+    try:
+        _zone(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return False
+    return True
+
+
+def zone(name=None):
+    """ZoneInfo for a user's timezone name; unknown or empty names use the default."""
+    return _zone(name) if name and is_valid_timezone(name) else _zone(DEFAULT_TIMEZONE)
+
+
+def to_utc(local, tz):
+    """Naive wall-clock time in tz -> naive UTC (fold=0: gaps shift forward, repeats fire first)."""
+    return local.replace(tzinfo=tz, fold=0).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_local(utc, tz):
+    """Naive UTC -> naive wall-clock time in tz."""
+    return utc.replace(tzinfo=timezone.utc).astimezone(tz).replace(tzinfo=None)
+
+
+# -------------------------------
+# Rules
+# -------------------------------
+
+
+def _weekday(token):
+    return WEEKDAYS.get(token.strip().lower()[:2]) if len(token.strip()) >= 2 else None
+
+
+def _parse_rrule(text):
+    parts = dict(p.split("=", 1) for p in text.removeprefix("rrule:").split(";") if "=" in p)
+    freq = {"daily": DAILY, "weekly": WEEKLY, "monthly": MONTHLY}.get(parts.get("freq", ""))
+    if not freq:
+        raise ValueError(f"unsupported FREQ in {text!r}")
+    byday = bymonthday = until = None
+    if "byday" in parts:
+        byday = frozenset(WEEKDAYS[d.strip()[-2:]] for d in parts["byday"].split(","))
+    if "bymonthday" in parts:
+        bymonthday = frozenset(int(d) for d in parts["bymonthday"].split(","))
+    if "until" in parts:
+        until = datetime.strptime(parts["until"][:8], "%Y%m%d").date()
+    return Rule(freq, max(1, int(parts.get("interval", 1))), byday, bymonthday, until)
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(rule_text):
+    """Parse a repeat_rule string into a Rule. Unknown rules fall back to daily."""
+    text = " ".join((rule_text or "one-time").lower().split())
+    if text in ("one-time", "once", "none"):
+        return Rule(ONCE, 1, None, None, None)
+    if text == "daily":
+        return Rule(DAILY, 1, None, None, None)
+    if text == "weekly":
+        return Rule(WEEKLY, 1, None, None, None)
+    if text == "monthly":
+        return Rule(MONTHLY, 1, None, None, None)
+    if text == "weekdays":
+        return Rule(WEEKLY, 1, frozenset(range(5)), None, None)
+    if text == "weekends":
+        return Rule(WEEKLY, 1, frozenset((5, 6)), None, None)
+    if "freq=" in text:
+        try:
+            return _parse_rrule(text.replace(" ", ""))
+        except (KeyError, ValueError):
+            return Rule(DAILY, 1, None, None, None)
+
+    match = _EVERY_N_RE.match(text)
+    if match:
+        return Rule(_UNITS[match.group(2)], max(1, int(match.group(1))), None, None, None)
+    match = _EVERY_DAYS_RE.match(text)
+    if match:
+        days = [_weekday(t) for t in re.split(r"[,\s]+", match.group(1)) if t and t != "and"]
+        if days and None not in days:
+            return Rule(WEEKLY, 1, frozenset(days), None, None)
+
+    return Rule(DAILY, 1, None, None, None)
+
+
+def _occurs_on(rule, anchor, day):
+    if rule.until and day > rule.until:
+        return False
+    if rule.freq in (ONCE, DAILY):
+        return (day - anchor).days % rule.interval == 0
+    if rule.freq == WEEKLY:
+        weekdays = rule.byday if rule.byday is not None else (anchor.weekday(),)
+        if day.weekday() not in weekdays:
+            return False
+        anchor_week = anchor - timedelta(days=anchor.weekday())
+        return ((day - anchor_week).days // 7) % rule.interval == 0
+    # MONTHLY
+    monthdays = rule.bymonthday if rule.bymonthday is not None else (anchor.day,)
+    if day.day not in monthdays:
+        return False
+    months = (day.year - anchor.year) * 12 + day.month - anchor.month
+    return months % rule.interval == 0
+
+
+def anchor_date(task, default=None, tz=None):
+    """Date the rule counts from: window start, else (local) creation date."""
+    if task.date_window_start:
+        return task.date_window_start
+    if task.created_at:
+        # created_at is naive UTC
+        return to_local(task.created_at, tz).date() if tz else task.created_at.date()
+    return default or date.today()
+
+
+def next_fire_after(task, after, tz=None):
+    """
+    Next occurrence of the task strictly after `after` (naive UTC), as naive
+    UTC. The rule, minute_of_day and the date window are read as wall-clock
+    values in tz (default zone if None). None if it will never fire again,
+    and always None for event-trigger tasks: they fire on messages, not times.
+    """
+    if task.minute_of_day is None or getattr(task, "event_type", None):
+        return None
+    tz = tz or zone()
+    rule = parse_rule(task.repeat_rule)
+    day = to_local(after, tz).date()
+    anchor = anchor_date(task, day, tz)
+    at = dtime(*divmod(task.minute_of_day, 60))
+
+    if task.date_window_start and day < task.date_window_start:
+        day = task.date_window_start
+    if rule.freq == ONCE:
+        # A one-time task simply fires at its next HH:MM
+        candidate = to_utc(datetime.combine(day, at), tz)
+        if candidate <= after:
+            day += timedelta(days=1)
+            candidate = to_utc(datetime.combine(day, at), tz)
+        if task.date_window_end and day > task.date_window_end:
+            return None
+        return candidate
+
+    for _ in range(MAX_SCAN_DAYS):
+        if task.date_window_end and day > task.date_window_end:
+            return None
+        if rule.until and day > rule.until:
+            return None
+        if _occurs_on(rule, anchor, day):
+            candidate = to_utc(datetime.combine(day, at), tz)
+            if candidate > after:
+                return candidate
+        day += timedelta(days=1)
+    return None
@@ -1,17 +1,61 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+import hmac
+import time
+from datetime import datetime
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response, session, stream_with_context, g, send_file
 from flask_login import login_required, current_user
 from app.services import auth_service, task_service
-from app.scheduler import scheduler, start_scheduler as start_scheduler_func, cancel_task, schedule_task, task_runner
-from app import csrf, db
+from app.scheduler import scheduler, start_scheduler as start_scheduler_func, stop_scheduler, schedule_task, run_now
+from app import csrf, db, db_pool, socketio, due_index, leader, metrics, notifier, presence, task_cache, voice
 from app.models import Task
-from datetime import datetime
 
 bp = Blueprint("main", __name__)
 
+# Columns tasks.html actually renders
+TASK_PAGE_FIELDS = ["id", "title", "time", "action", "notification_type", "notify_enabled", "event_type"]
+
+_request_latency = metrics.histogram(
+    "http_request_duration_seconds", "Request latency by route", ("endpoint", "method", "status"))
+_request_queries = metrics.histogram(
+    "http_request_db_queries", "SQL statements per request by route", ("endpoint",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+
+# Registered first so it also times requests the hooks below short-circuit
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.db_queries = 0  # incremented by db_pool's statement listener
+
+@bp.after_app_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is not None:
+        # Route template, not the raw path, to keep label cardinality bounded
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        _request_latency.observe(time.perf_counter() - started, endpoint=endpoint,
+                                 method=request.method, status=response.status_code)
+        _request_queries.observe(g.db_queries, endpoint=endpoint)
+    return response
+
 @bp.before_app_request
 def start_scheduler():
-    if not scheduler.running:
-        start_scheduler_func(current_app)
+    # Only the elected leader process runs the scheduler; election happens once,
+    # so after the first request this is a single flag check
+    if leader.attempted():
+        return
+    if not scheduler.running and current_app.config.get("SCHEDULER_ENABLED", True):
+        leader.elect(current_app._get_current_object(), start_scheduler_func, on_lost=stop_scheduler)
+
+def session_user_id():
+    """
+    Logged-in user id straight from the signed session cookie, without loading
+    the user (no user_loader, no users query). For high-frequency JSON polls.
+    """
+    user_id = session.get("_user_id")
+    try:
+        return int(user_id) if user_id is not None else None
+    except (TypeError, ValueError):
+        return None
 
 @bp.route("/")
 def index():
@@ -54,36 +98,64 @@ def logout():
 def tasks():
     if request.method == "POST":
         title = request.form.get("title") or "Reminder"
-        time = request.form.get("time") or "23:59"
         action = request.form.get("action") or ""
-        notification_type = task_service.infer_task_type(action)
+        events = {f: request.form.get(f) or None for f in task_service.EVENT_FIELDS}
+        # Event-trigger tasks get no clock time
+        time = request.form.get("time") or (None if events["event_type"] else "23:59")
 
-        task = task_service.add_task(title, time, action, current_user, notification_type)
+        # add_task infers the notification type from the action text itself
+        try:
+            task = task_service.add_task(title, time, action, current_user, **events)
+        except ValueError as e:
+            flash(f"⚠️ {e}", "danger")
+            return redirect(url_for("main.tasks"))
         schedule_task(task)
         flash("✅ Task added successfully!", "success")
         return redirect(url_for("main.tasks"))
 
-    tasks_list = Task.query.filter_by(user_id=current_user.id).all()
-    return render_template("tasks.html", tasks=tasks_list)
+    # Render one page only; "Load more" follows the keyset cursor
+    try:
+        tasks_list, next_cursor = task_service.list_tasks(
+            current_user,
+            fields=TASK_PAGE_FIELDS,
+            cursor=request.args.get("cursor"),
+            limit=current_app.config.get("TASKS_PAGE_SIZE", task_service.DEFAULT_PAGE_SIZE),
+        )
+    except ValueError:
+        return redirect(url_for("main.tasks"))
+    return render_template("tasks.html", tasks=tasks_list, next_cursor=next_cursor)
+
+@bp.route("/api/tasks")
+@login_required
+def api_tasks():
+    # /api/tasks?fields=id,title,time&limit=100&cursor=<next_cursor>
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()]
+    try:
+        items, next_cursor = task_service.list_tasks(
+            current_user,
+            fields=fields or None,
+            cursor=request.args.get("cursor"),
+            limit=request.args.get("limit", task_service.DEFAULT_PAGE_SIZE, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"tasks": items, "next_cursor": next_cursor})
 
 @bp.route("/tasks/edit/<int:task_id>", methods=["POST"])
 @login_required
 @csrf.exempt
 def edit_task(task_id):
-    task = Task.query.filter_by(id=task_id, user_id=current_user.id).first()
+    task = task_service.edit_task(
+        task_id,
+        current_user,
+        title=request.form.get("title"),
+        time=request.form.get("time"),
+        action=request.form.get("action"),
+    )
     if not task:
         flash("⚠️ Task not found.", "danger")
         return redirect(url_for("main.tasks"))
 
-    task.title = request.form.get("title") or "Reminder"
-    task.time = request.form.get("time") or "23:59"
-    task.action = request.form.get("action") or ""
-    task.notification_type = task_service.infer_task_type(task.action)
-
-    cancel_task(task.id)
-    schedule_task(task)
-    db.session.commit()
-
     flash("✏️ Task updated successfully!", "success")
     return redirect(url_for("main.tasks"))
 
@@ -91,11 +163,7 @@ def edit_task(task_id):
 @login_required
 @csrf.exempt
 def delete_task(task_id):
-    task = Task.query.filter_by(id=task_id, user_id=current_user.id).first()
-    if task:
-        cancel_task(task.id)
-        db.session.delete(task)
-        db.session.commit()
+    if task_service.delete_task(task_id, current_user):
         flash("🗑️ Task deleted successfully!", "success")
     return redirect(url_for("main.tasks"))
 
@@ -103,21 +171,53 @@ def delete_task(task_id):
 @login_required
 @csrf.exempt
 def clear_tasks():
-    tasks_list = Task.query.filter_by(user_id=current_user.id).all()
-    for t in tasks_list:
-        cancel_task(t.id)
-        db.session.delete(t)
-    db.session.commit()
+    task_service.clear_tasks(current_user)
     flash("🗑️ All tasks cleared!", "success")
     return redirect(url_for("main.tasks"))
 
+@bp.route("/tasks/import", methods=["POST"])
+@login_required
+@csrf.exempt
+def import_tasks():
+    # Accepts an uploaded .csv/.json file, a JSON body, or a text/csv body
+    upload = request.files.get("file")
+    if upload:
+        text = upload.read().decode("utf-8-sig")
+        fmt = "csv" if upload.filename.lower().endswith(".csv") else "json"
+    else:
+        text = request.get_data(as_text=True)
+        fmt = "csv" if request.mimetype == "text/csv" else "json"
+
+    try:
+        records = task_service.read_import_records(text, fmt)
+        created, errors = task_service.import_tasks(records, current_user)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"success": False, "message": f"Invalid import file: {e}"}), 400
+
+    return jsonify({
+        "success": True,
+        "created": created,
+        "errors": [{"row": row, "message": message} for row, message in errors],
+    })
+
+@bp.route("/tasks/export")
+@login_required
+def export_tasks():
+    fmt = "csv" if request.args.get("format") == "csv" else "json"
+    lines = task_service.export_lines(task_service.export_tasks(current_user), fmt)
+    return Response(
+        stream_with_context(lines),
+        mimetype="text/csv" if fmt == "csv" else "application/json",
+        headers={"Content-Disposition": f"attachment; filename=tasks.{fmt}"},
+    )
+
 @bp.route("/tasks/run_now/<int:task_id>", methods=["POST"])
 @login_required
 @csrf.exempt
 def run_task_now(task_id):
     task = Task.query.filter_by(id=task_id, user_id=current_user.id).first()
     if task:
-        task_runner(task_id)
+        run_now(task, current_app._get_current_object(), socketio)
         flash("▶️ Task executed immediately!", "success")
     return redirect(url_for("main.tasks"))
 
@@ -126,20 +226,127 @@ def run_task_now(task_id):
 @login_required
 @csrf.exempt
 def toggle_task_notification(task_id):
-    task = Task.query.filter_by(id=task_id, user_id=current_user.id).first()
+    # Flip the DB column (notify_enabled) and keep the due index in sync
+    task = task_service.toggle_task_notification(task_id, current_user)
     if not task:
         return jsonify({"success": False, "message": "Task not found"}), 404
-
-    # Flip the DB column (notify_enabled)
-    task.notify_enabled = not task.notify_enabled
-    db.session.commit()
     return jsonify({"success": True, "notify_enabled": task.notify_enabled})
 
-@bp.route("/check_notifications")
+# Browser-reported IANA timezone; task times are read in it
+@bp.route("/settings/timezone", methods=["POST"])
 @login_required
+@csrf.exempt
+def set_timezone():
+    data = request.get_json(silent=True) or request.form
+    tz_name = (data.get("timezone") or "").strip()
+    if not task_service.set_user_timezone(current_user, tz_name):
+        return jsonify({"success": False, "message": f"Unknown timezone: {tz_name}"}), 400
+    return jsonify({"success": True, "timezone": tz_name})
+
+@bp.route("/check_notifications")
 def check_notifications():
-    now = datetime.now().strftime("%H:%M")
-    # only return tasks that have notify_enabled True
-    due_tasks = Task.query.filter_by(user_id=current_user.id, time=now, notify_enabled=True).all()
-    results = [{"id": t.id, "title": t.title or "Reminder", "body": t.action or "You have a task!"} for t in due_tasks]
-    return jsonify(results)
+    # Answered from the in-memory due index and the session cookie: once the
+    # index is loaded a poll touches neither the tasks nor the users table.
+    # Buckets are UTC minutes, so this agrees with the scheduler in every zone.
+    #
+    # ?wait=N makes it a long poll: while there is nothing new for the client
+    # (no due tasks, or only the ones its If-None-Match ETag already covers)
+    # the request parks for up to N seconds (LONGPOLL_MAX_SECONDS), waking at
+    # the user's next due minute or when the user's tasks change. Every
+    # answer carries that next due minute (X-Next-Due-At / X-Next-Due-In),
+    # so short pollers can sleep until then instead of polling on a timer.
+    user_id = session_user_id()
+    if user_id is None:
+        return jsonify({"success": False, "message": "Login required"}), 401
+    due_index.ensure_loaded(current_app.config.get("DUE_INDEX_MAX_AGE", 0))
+    presence.record_poll(user_id)
+
+    wait = min(max(request.args.get("wait", 0, type=float), 0), current_app.config.get("LONGPOLL_MAX_SECONDS", 50))
+    deadline = time.time() + wait
+    parked = wait > 0 and presence.park()
+    try:
+        while True:
+            minute = due_index.current_minute()
+            version = due_index.version(user_id)
+            etag = due_index.etag(user_id, minute)
+            seen = request.if_none_match.contains(etag)
+            due = [] if seen else due_index.due_for_user(user_id, minute)
+            next_minute = due_index.next_due_minute(user_id, minute + 1)
+            if not parked or due:
+                break
+            wake_at = min(deadline, next_minute * 60) if next_minute is not None else deadline
+            if wake_at <= time.time():
+                if time.time() >= deadline:
+                    break
+                continue  # the next due minute has started
+            due_index.wait_for_change(user_id, version, wake_at - time.time())
+    finally:
+        if parked:
+            presence.unpark()
+
+    headers = {"Cache-Control": "private, no-cache"}
+    if next_minute is not None:
+        headers["X-Next-Due-At"] = f"{datetime.utcfromtimestamp(next_minute * 60).isoformat()}Z"
+        headers["X-Next-Due-In"] = str(max(0, int(next_minute * 60 - time.time())))
+    if seen:
+        return "", 304, {"ETag": f'"{etag}"', **headers}
+
+    # only tasks that have notify_enabled True are indexed
+    response = jsonify(due)
+    response.set_etag(etag)
+    response.headers.update(headers)
+    return response
+
+# Spoken alert for a task as a WAV clip (VOICE_MODE=browser). Served from the
+# content-addressed clip cache; rendered on the TTS worker on a miss.
+@bp.route("/voice/<int:task_id>.wav")
+@login_required
+def voice_clip(task_id):
+    if voice.MODE != voice.MODE_BROWSER:
+        return jsonify({"success": False, "message": "Voice clips are disabled"}), 404
+    task = task_cache.load(task_id)
+    if task is None or task.user_id != current_user.id:
+        return jsonify({"success": False, "message": "Task not found"}), 404
+    text = voice.spoken_text(task.title, task.action)
+    try:
+        path = voice.ensure_clip(text, timeout=current_app.config.get("VOICE_RENDER_TIMEOUT", 10.0))
+    except FutureTimeoutError:
+        return jsonify({"success": False, "message": "Voice clip is still rendering"}), 503
+    except Exception as e:  # no TTS engine on this host, synthesis failed
+        current_app.logger.warning("⚠️ Voice clip for task %s failed: %s", task_id, e)
+        return jsonify({"success": False, "message": "Voice synthesis unavailable"}), 503
+    response = send_file(path, mimetype="audio/wav", conditional=True, etag=voice.clip_key(text))
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+# Push vs. poll accounting for this process
+@bp.route("/api/delivery_stats")
+@login_required
+def delivery_stats():
+    pushes, items = notifier.stats["pushes"], notifier.stats["pushed_items"]
+    return jsonify({
+        "pushes": pushes,
+        "pushed_notifications": items,
+        "coalesced": items - pushes,
+        **presence.snapshot(),
+    })
+
+# Connection pool usage and checkout wait for this process
+@bp.route("/api/pool_stats")
+@login_required
+def pool_stats():
+    return jsonify(db_pool.snapshot(db.engine))
+
+# Prometheus text exposition for this process. Requires METRICS_TOKEN, sent as
+# "Authorization: Bearer <token>" by the scraper; not served without one unless
+# METRICS_PUBLIC=1.
+@bp.route("/metrics")
+def metrics_endpoint():
+    token = current_app.config.get("METRICS_TOKEN")
+    if not token and not current_app.config.get("METRICS_PUBLIC"):
+        return Response("metrics disabled: set METRICS_TOKEN\n", status=404, mimetype="text/plain")
+    if token:
+        supplied = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(supplied, f"Bearer {token}"):
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
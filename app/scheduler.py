@@ -1,91 +1,419 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from pytz import timezone
-from datetime import datetime
-from app.models import Task
-import pyttsx3
+from apscheduler.jobstores.base import JobLookupError
+from datetime import datetime, time as dtime, timedelta, timezone
+from sqlalchemy import update
+from app import db
+from app.models import Task, User
+from app import notifier, firing_ledger, due_index, event_index, event_sources, outbox, recurrence, metrics, task_cache
+import logging
+import time
 
-scheduler = BackgroundScheduler(timezone=timezone("Asia/Kolkata"))
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+# Reconfigured to the TIMEZONE setting on start; task times are per user (see recurrence)
+scheduler = BackgroundScheduler(timezone=recurrence.zone())
 scheduler_started = False
 _app = None
-_socketio = None
 
-# Keep track of already emitted tasks to prevent duplicates
-_emitted_tasks = set()
+# Both modes fire a task when its materialized next_fire_at (UTC) has passed.
+# "per_task": one CronTrigger job per Task wakes it at its HH:MM in the owner's zone
+# "dispatcher": a single job fires every minute and range-scans next_fire_at,
+#               whatever the owners' timezones
+MODE_PER_TASK = "per_task"
+MODE_DISPATCHER = "dispatcher"
+DISPATCHER_JOB_ID = "dispatcher_tick"
+_mode = MODE_PER_TASK
+
+PRUNE_JOB_ID = "firing_ledger_prune"
+
+# Rows streamed from the DB per round-trip when bootstrapping per-task jobs
+BOOTSTRAP_BATCH_SIZE = 1000
+# Due tasks loaded per dispatcher query (a 09:00 burst is processed in chunks)
+DISPATCH_BATCH_SIZE = 1000
+# Slots older than this when finally processed (e.g. after downtime) are skipped
+_catchup_minutes = 15
+
+# Filled by start_scheduler: {"tasks", "skipped", "duration_s", "peak_rss_mb"}
+bootstrap_stats = {}
+
+log = logging.getLogger(__name__)
+
+# -------------------------------
+# Metrics (see /metrics)
+# -------------------------------
+LAG_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 900)
+_fired_total = metrics.counter("scheduler_tasks_fired_total", "Task slots fired by this process")
+_stale_total = metrics.counter(
+    "scheduler_tasks_stale_total", "Due slots older than the catch-up window, advanced without firing"
+)
+_dispatch_lag = metrics.histogram(
+    "scheduler_dispatch_lag_seconds", "Fire time minus the slot's scheduled time", buckets=LAG_BUCKETS
+)
+_runner_duration = metrics.histogram("scheduler_task_runner_seconds", "task_runner duration", ("manual",))
+_tick_duration = metrics.histogram("scheduler_dispatch_tick_seconds", "Dispatcher tick duration")
+
+
+@metrics.collector
+def _collect():
+    jobs = len(scheduler.get_jobs()) if scheduler.running else 0
+    yield ("scheduler_jobs", "gauge", "Jobs registered in APScheduler", (), [((), jobs)])
+    yield ("scheduler_running", "gauge", "1 if this process runs the scheduler", (),
+           [((), int(scheduler.running))])
 
 def start_scheduler(app, socketio=None):
-    global scheduler_started, _app, _socketio
+    global scheduler_started, _app, _mode, _catchup_minutes
     _app = app
+    _mode = app.config.get("SCHEDULER_MODE", MODE_PER_TASK)
+    _catchup_minutes = app.config.get("FIRING_CATCHUP_MINUTES", _catchup_minutes)
     if not scheduler_started:
+        scheduler.configure(timezone=recurrence.zone())
         scheduler.start()
         scheduler_started = True
-        print("✅ Scheduler started")
+        log.info("✅ Scheduler started")
 
-    if socketio:
-        _socketio = socketio
+    notifier.start(app, socketio)
+    firing_ledger.configure(app)
+    # Incoming email/WhatsApp messages fire matching event-trigger tasks
+    # through the same path as "Run now"
+    event_sources.start(app, lambda task_id: task_runner(task_id, manual=True))
+    scheduler.add_job(
+        func=_prune_ledger,
+        trigger=CronTrigger(minute=7),
+        id=PRUNE_JOB_ID,
+        replace_existing=True,
+    )
 
-    # Schedule tasks from DB
+    # Materialize next_fire_at for rows that predate it, then fire/advance
+    # whatever came due while no scheduler was running
     with _app.app_context():
-        tasks = Task.query.filter_by(enabled=True).all()
-        for task in tasks:
-            schedule_task(task)
-        print(f"📌 Scheduled {len(tasks)} task(s) from DB")
+        _backfill_next_fire()
+    dispatch_due_tasks()
+
+    if _mode == MODE_DISPATCHER:
+        # One job for every task: due tasks are read from the DB at each tick
+        scheduler.add_job(
+            func=dispatch_due_tasks,
+            trigger=CronTrigger(second=0),
+            id=DISPATCHER_JOB_ID,
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1,
+            misfire_grace_time=30,
+        )
+        log.info("📌 Dispatcher scheduled (one tick per minute)")
+        return
 
-def task_runner(task_id):
+    # Schedule tasks from DB
     with _app.app_context():
-        task = Task.query.get(task_id)
-        if not task or task_id in _emitted_tasks:
-            return
+        _bootstrap_jobs()
 
-        _emitted_tasks.add(task_id)  # prevent duplicate notification
-
-        title = task.title or "Reminder"
-        body = task.action or "You have a task!"
-        print(f"[{datetime.now()}] 🔔 {title}: {body}")
-
-        # Emit to the specific user only
-        if _socketio:
-            try:
-                _socketio.emit(
-                    "task_notification",
-                    {"id": task.id, "title": title, "body": body},
-                    room=f"user_{task.user_id}"
-                )
-                print(f"📢 Emitted notification for task {task.id} (user {task.user_id})")
-            except Exception as e:
-                print(f"⚠️ SocketIO emit failed: {e}")
-
-        # Optional voice alert
-        try:
-            engine = pyttsx3.init()
-            engine.say(f"{title}. {body}")
-            engine.runAndWait()
-        except Exception as e:
-            print(f"⚠️ Voice alert failed: {e}")
+def stop_scheduler():
+    """
+    Leadership lost (leader.elect on_lost): stop firing in this process, so
+    only the new leader does. start_scheduler starts over if re-elected.
+    """
+    global scheduler_started
+    event_sources.stop()
+    if scheduler_started:
+        scheduler.remove_all_jobs()
+        scheduler.shutdown(wait=False)
+        scheduler_started = False
+    task_cache.clear()
+    log.warning("🛑 Scheduler stopped: no longer the leader")
 
-def schedule_task(task):
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (2**20 if peak > 2**32 else 2**10), 1)
+
+def _bootstrap_jobs():
+    """Stream the snapshot columns of enabled tasks, register their jobs and cache their snapshots."""
+    started = time.perf_counter()
+    scheduled = skipped = 0
+    triggers = {}  # tasks due at the same minute share one (stateless) CronTrigger
+    version = task_cache.begin()
+    rows = (
+        db.session.query(*task_cache.COLUMNS, User.timezone)
+        .join(User, Task.user_id == User.id)
+        .filter(Task.enabled.is_(True), Task.event_type.is_(None))
+        .execution_options(stream_results=True, yield_per=BOOTSTRAP_BATCH_SIZE)
+    )
+    for row in rows:
+        if _add_task_job(row, triggers, recurrence.zone(row.timezone)):
+            task_cache.put(task_cache.snapshot_of(row, row.timezone, version))
+            scheduled += 1
+        else:
+            skipped += 1
+
+    bootstrap_stats.update(
+        tasks=scheduled,
+        skipped=skipped,
+        duration_s=round(time.perf_counter() - started, 3),
+        peak_rss_mb=_peak_rss_mb(),
+    )
+    log.info(
+        "📌 Scheduled %d task(s) from DB in %ss (%d skipped, peak RSS %s MB)",
+        scheduled, bootstrap_stats["duration_s"], skipped, bootstrap_stats["peak_rss_mb"],
+    )
+
+def utc_now():
+    """Current time as naive UTC, the representation of Task.next_fire_at."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _backfill_next_fire():
+    """
+    Compute next_fire_at for enabled clock tasks that don't have one yet,
+    and clear it on event-trigger tasks (they fire on messages only).
+    """
+    now = utc_now()
+    cleared = (
+        db.session.query(Task)
+        .filter(Task.event_type.isnot(None), Task.next_fire_at.isnot(None))
+        .update({"next_fire_at": None}, synchronize_session=False)
+    )
+    rows = (
+        db.session.query(
+            Task.id, Task.minute_of_day, Task.repeat_rule,
+            Task.date_window_start, Task.date_window_end, Task.created_at, User.timezone,
+        )
+        .join(User, Task.user_id == User.id)
+        .filter(Task.enabled.is_(True), Task.next_fire_at.is_(None), Task.minute_of_day.isnot(None),
+                Task.event_type.is_(None))
+        .all()
+    )
+    updates = [
+        {"id": r.id, "next_fire_at": recurrence.next_fire_after(r, now, recurrence.zone(r.timezone))}
+        for r in rows
+    ]
+    for start in range(0, len(updates), BOOTSTRAP_BATCH_SIZE):
+        db.session.execute(update(Task), updates[start:start + BOOTSTRAP_BATCH_SIZE])
+    db.session.commit()
+    if updates:
+        log.info("🗓️ Computed next_fire_at for %d task(s)", len(updates))
+    if cleared:
+        log.info("🗓️ Cleared the clock time of %d event-trigger task(s)", cleared)
+
+def task_runner(task_id, manual=False):
+    """Fire one task. Scheduled firings are deduped through the ledger; manual runs are not."""
+    started = time.perf_counter()
     try:
-        hour, minute = map(int, task.time.split(":"))
-    except Exception:
-        print(f"⚠️ Invalid time format for task {task.id}: {task.time}")
-        return
+        _run_task(task_id, manual)
+    finally:
+        _runner_duration.observe(time.perf_counter() - started, manual=str(manual).lower())
 
-    job_id = f"task_{task.id}"
-    cancel_task(task.id)
+def _run_task(task_id, manual):
+    # Snapshot cached at schedule time / after the last firing (see task_cache)
+    task = task_cache.get(task_id)
+    if task is None:
+        with _app.app_context():
+            task = task_cache.load(task_id)
+        if task is None:
+            return
+    if manual:
+        batch = [_payload(task)]
+    else:
+        now = utc_now()
+        # The cron job wakes daily at HH:MM; the recurrence rule decides
+        if not task.enabled or task.next_fire_at is None or task.next_fire_at > now:
+            return
+        with _app.app_context():
+            batch = _fire_due([task], now, {task.user_id: task.timezone})
+    for payload in batch:
+        notifier.enqueue(*payload)
+
+def run_now(task, app, socketio=None):
+    """
+    "Run now" from a request, on whichever worker serves it (not only the
+    scheduler leader): task is the ORM row the request already loaded, and
+    delivery goes through this process's notifier, started on first use.
+    With several workers, socket emits reach the user's room through the
+    shared message queue.
+    """
+    notifier.start(app, socketio)
+    notifier.enqueue(*_payload(task))
+
+def _payload(task):
+    return (task.id, task.user_id, task.title, task.action, task.channels_list())
+
+def _fire_due(tasks, now, zones):
+    """
+    Fire and advance tasks whose next_fire_at <= now (naive UTC); zones maps
+    user_id -> timezone name for computing the next occurrence. Each slot is
+    claimed in the firing ledger first; slots older than the catch-up window
+    are skipped.
+    Tasks with no further occurrence (one-time, ended window/UNTIL) are disabled.
+    Event-trigger tasks never fire here and are never disabled: a stray
+    next_fire_at on one is just cleared.
+    tasks are Task objects or task_cache snapshots.
+    Returns notification payloads for the tasks this process fired.
+    """
+    events = [t.id for t in tasks if t.event_type]
+    if events:
+        tasks = [t for t in tasks if not t.event_type]
+        db.session.execute(update(Task), [{"id": task_id, "next_fire_at": None} for task_id in events])
+        db.session.commit()
+        for task_id in events:
+            due_index.remove(task_id)
+            task_cache.invalidate(task_id)
+            cancel_task(task_id)
+        if not tasks:
+            return []
+    stale_before = now - timedelta(minutes=_catchup_minutes)
+    fresh = [t for t in tasks if t.next_fire_at >= stale_before]
+    claimed = firing_ledger.claim_many((t.id, t.next_fire_at) for t in fresh)
+    fired = {t.id for t in fresh if (t.id, t.next_fire_at) in claimed}
+    _stale_total.inc(len(tasks) - len(fresh))
+    _fired_total.inc(len(fired))
+    for task in fresh:
+        if task.id in fired:
+            _dispatch_lag.observe((now - task.next_fire_at).total_seconds())
+    # read before the commit below expires them
+    batch = [_payload(t) for t in tasks if t.id in fired and t.notify_enabled]
+
+    updates, retired = [], []
+    for task in tasks:
+        if recurrence.parse_rule(task.repeat_rule).freq == recurrence.ONCE:
+            upcoming = None
+        else:
+            tz = recurrence.zone(zones.get(task.user_id))
+            upcoming = recurrence.next_fire_after(task, max(task.next_fire_at, now), tz)
+        updates.append({"id": task.id, "next_fire_at": upcoming, "enabled": upcoming is not None})
+        if upcoming is None:
+            retired.append(task.id)
+    db.session.execute(update(Task), updates)
+    db.session.commit()
+
+    for row in updates:
+        due_index.advance(row["id"], row["next_fire_at"])
+        task_cache.advance(row["id"], row["next_fire_at"], row["enabled"])
+    for task_id in retired:
+        cancel_task(task_id)
+        event_index.remove(task_id)
+    return batch
+
+def dispatch_due_tasks(now=None):
+    """Dispatcher tick: range-scan tasks with next_fire_at <= now, fire and advance them."""
+    now = now or utc_now()
+    started = time.perf_counter()
+    total = 0
+    with _app.app_context():
+        while True:
+            due = (
+                db.session.query(Task, User.timezone)
+                .join(User, Task.user_id == User.id)
+                .filter(Task.enabled.is_(True), Task.next_fire_at <= now)
+                .order_by(Task.next_fire_at)
+                .limit(DISPATCH_BATCH_SIZE)
+                .all()
+            )
+            if not due:
+                break
+            batch = _fire_due([task for task, _ in due], now, {task.user_id: tz for task, tz in due})
+            # The notifier fans out off this thread
+            for payload in batch:
+                notifier.enqueue(*payload)
+            total += len(batch)
+            if len(due) < DISPATCH_BATCH_SIZE:
+                break
+    _tick_duration.observe(time.perf_counter() - started)
+    if total:
+        log.info("[%s UTC] 📬 Dispatched %d task(s)", f"{now:%H:%M}", total)
+    return total
+
+def _prune_ledger():
+    with _app.app_context():
+        removed = firing_ledger.prune()
+        expired = outbox.prune()
+    if removed:
+        log.info("🧹 Pruned %d firing ledger row(s)", removed)
+    if expired:
+        log.info("🧹 Expired %d outbox item(s)", expired)
+
+def _add_task_job(task, trigger_cache=None, tz=None):
+    """
+    Register the cron job for a task (ORM object or row), at its HH:MM in tz
+    (the owner's zone). Returns False if unschedulable.
+    """
+    if getattr(task, "event_type", None):
+        return False  # fired by incoming messages (event_sources), not a clock
+    if task.minute_of_day is None:
+        log.warning("⚠️ Invalid time format for task %s: %s", task.id, task.time)
+        return False
+
+    # Wake daily at HH:MM; task_runner skips days the repeat rule doesn't cover
+    hour, minute = divmod(task.minute_of_day, 60)
+    cron = {"hour": hour, "minute": minute, "timezone": tz or recurrence.zone()}
+    if task.date_window_start:
+        cron["start_date"] = task.date_window_start
+    if task.date_window_end:
+        cron["end_date"] = datetime.combine(task.date_window_end, dtime.max)
+
+    if trigger_cache is None:
+        trigger = CronTrigger(**cron)
+    else:
+        key = tuple(sorted((k, str(v)) for k, v in cron.items()))
+        trigger = trigger_cache.get(key)
+        if trigger is None:
+            trigger = trigger_cache[key] = CronTrigger(**cron)
 
     scheduler.add_job(
         func=task_runner,
-        trigger=CronTrigger(hour=hour, minute=minute),
+        trigger=trigger,
         args=[task.id],
-        id=job_id,
+        id=f"task_{task.id}",
         replace_existing=True,
     )
-    print(f"✅ Scheduled task {task.id}: {task.title} at {task.time}")
+    return True
+
+def schedule_task(task):
+    if _mode == MODE_DISPATCHER:
+        return  # picked up by the next dispatcher tick
+
+    cancel_task(task.id)
+    timezone_name = task.owner.timezone
+    if _add_task_job(task, tz=recurrence.zone(timezone_name)):
+        task_cache.put(task_cache.snapshot_of(task, timezone_name, task_cache.begin()))
+        log.debug("✅ Scheduled task %s: %s at %s", task.id, task.title, task.time)
+
+def schedule_tasks(tasks, tz=None):
+    """
+    Register jobs for many tasks of one user (rows with task_cache.COLUMNS or
+    ORM objects) in one pass. tz is the owner's ZoneInfo.
+    """
+    if _mode == MODE_DISPATCHER or not tasks:
+        return 0
+    triggers = {}
+    version = task_cache.begin()
+    scheduled = 0
+    for task in tasks:
+        if _add_task_job(task, triggers, tz):
+            task_cache.put(task_cache.snapshot_of(task, getattr(tz, "key", None), version))
+            scheduled += 1
+    log.info("✅ Scheduled %d task(s)", scheduled)
+    return scheduled
+
+def cancel_tasks(task_ids):
+    """Remove many task jobs at once (clear_tasks); unknown ids are ignored."""
+    if _mode == MODE_DISPATCHER or not task_ids:
+        return 0
+    removed = 0
+    for task_id in task_ids:
+        try:
+            scheduler.remove_job(f"task_{task_id}")
+            removed += 1
+        except JobLookupError:
+            pass
+    log.info("🗑️ Cancelled %d task job(s)", removed)
+    return removed
 
 def cancel_task(task_id):
     job_id = f"task_{task_id}"
     if scheduler.get_job(job_id):
         scheduler.remove_job(job_id)
-        print(f"🗑️ Cancelled task {task_id}")
-        # Also remove from emitted set to allow reschedule
-        _emitted_tasks.discard(task_id)
+        log.debug("🗑️ Cancelled task %s", task_id)
@@ -0,0 +1,86 @@
+import re
+from functools import lru_cache
+
+# -------------------------------
+# Compiled patterns
+# -------------------------------
+# Keyword -> notification type. Earlier types win ("alarm" beats "banner").
+KEYWORD_TYPES = {
+    "wake me": "alarm",
+    "alarm": "alarm",
+    "remind me": "alarm",
+    "check": "banner",
+    "read": "banner",
+    "email": "banner",
+    "meeting": "banner",
+}
+TYPE_PRIORITY = ("alarm", "banner")
+DEFAULT_TYPE = "push"
+
+# One alternation inside a lookahead: a single left-to-right scan reports every
+# keyword occurrence, overlapping ones included (same as `word in text`).
+_KEYWORDS_RE = re.compile(
+    "(?=(" + "|".join(re.escape(k) for k in sorted(KEYWORD_TYPES, key=len, reverse=True)) + "))"
+)
+_TIME_RE = re.compile(r"(\d{1,2})([:.]?)(\d{0,2})\s*(am|pm)?")
+_SPACES_RE = re.compile(r"\s+")
+
+CACHE_SIZE = 4096
+
+
+def normalize(action_text):
+    """Lower-case and collapse whitespace; this is the cache key."""
+    return _SPACES_RE.sub(" ", (action_text or "").strip().lower())
+
+
+# -------------------------------
+# Parsing
+# -------------------------------
+def _infer_type(text):
+    best = None
+    for match in _KEYWORDS_RE.finditer(text):
+        found = KEYWORD_TYPES[match.group(1)]
+        if found == TYPE_PRIORITY[0]:
+            return found
+        best = found
+    return best or DEFAULT_TYPE
+
+
+def _extract_time(text):
+    match = _TIME_RE.search(text)
+    if not match:
+        return None
+    hour = int(match.group(1))
+    minute = int(match.group(3) or 0)
+    period = match.group(4)
+    if period == "pm" and hour < 12:
+        hour += 12
+    if period == "am" and hour == 12:
+        hour = 0
+    return f"{hour:02d}:{minute:02d}"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_normalized(text):
+    return _infer_type(text), _extract_time(text)
+
+
+def parse(action_text):
+    """
+    Return (notification_type, time) inferred from action_text.
+    Example: "Wake me at 7:30 am" -> ("alarm", "07:30")
+    """
+    return _parse_normalized(normalize(action_text))
+
+
+def infer_type(action_text):
+    return parse(action_text)[0]
+
+
+def parse_many(actions):
+    """Batch parse for bulk import / re-classification; repeated phrases hit the cache."""
+    return [_parse_normalized(normalize(action)) for action in actions]
+
+
+def cache_info():
+    return _parse_normalized.cache_info()
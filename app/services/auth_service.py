@@ -1,8 +1,10 @@
 from flask import flash, redirect, url_for
 from flask_login import login_user, logout_user
-from app import db, bcrypt
+from app import db, hashing
 from app.models import User
 
+BUSY_MESSAGE = "⏳ Too many sign-ins right now, please try again in a moment."
+
 # -------------------------------
 # Register a new user
 # -------------------------------
@@ -12,7 +14,11 @@ def register_user(username, password):
         flash("⚠️ Username already exists.", "danger")
         return redirect(url_for("main.register"))
 
-    hashed_pw = bcrypt.generate_password_hash(password).decode("utf-8")
+    try:
+        hashed_pw = hashing.generate_password_hash(password)
+    except hashing.HashingBusy:
+        flash(BUSY_MESSAGE, "warning")
+        return redirect(url_for("main.register"))
     user = User(username=username, password=hashed_pw)
     db.session.add(user)
     db.session.commit()
@@ -26,7 +32,13 @@ def register_user(username, password):
 def login_user_service(username, password):
     user = User.query.filter_by(username=username).first()
 
-    if not user or not bcrypt.check_password_hash(user.password, password):
+    try:
+        valid = bool(user) and hashing.check_password_hash(user.password, password)
+    except hashing.HashingBusy:
+        flash(BUSY_MESSAGE, "warning")
+        return redirect(url_for("main.login"))
+
+    if not valid:
         flash("❌ Invalid username or password.", "danger")
         return redirect(url_for("main.login"))
 
@@ -1,7 +1,40 @@
 from app import db
-from app.models import Task
-from app.scheduler import schedule_task, cancel_task
-import re
+from app.models import Task, TaskFiring, parse_minute_of_day
+from app.scheduler import schedule_task, schedule_tasks, cancel_task, cancel_tasks, utc_now
+from app import due_index, event_index, firing_ledger, recurrence, task_cache
+from app.services import action_parser
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, insert, or_, select
+from itertools import islice
+from types import SimpleNamespace
+import base64
+import csv
+import io
+import json
+
+# Fields the JSON listing API can project (?fields=id,title,time)
+LISTING_FIELDS = (
+    "id", "title", "time", "action", "notification_type", "channels",
+    "event_type", "event_sender", "event_contact", "event_keyword",
+    "date_window_start", "date_window_end", "repeat_rule", "next_fire_at",
+    "enabled", "notify_enabled", "created_at", "user_id",
+)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Optional trigger on an incoming message (see app/event_index.py)
+EVENT_FIELDS = ("event_type", "event_sender", "event_contact", "event_keyword")
+
+# Columns accepted by bulk import and written by export (same order)
+TRANSFER_FIELDS = (
+    "title", "time", "action", "notification_type", "channels", "repeat_rule",
+    "date_window_start", "date_window_end", "enabled", "notify_enabled",
+) + EVENT_FIELDS
+IMPORT_CHUNK_SIZE = 1000
+
+def _arming_time():
+    """next_fire_at is computed after this, so a task set for the current minute still fires."""
+    return utc_now().replace(second=0, microsecond=0) - timedelta(microseconds=1)
 
 # -------------------------------
 # Add a task
@@ -21,7 +54,7 @@ def add_task(
     date_window_end=None,
     repeat_rule="one-time"
 ):
-    """Create and schedule a new task."""
+    """Create and schedule a new task. Raises ValueError if the (given or inferred) time is not HH:MM."""
 
     if not action:
         action = "No action"
@@ -29,7 +62,10 @@ def add_task(
     # Infer type + time from action text
     inferred_type, inferred_time = parse_action_for_task(action)
     notification_type = notification_type or inferred_type
-    time = time or inferred_time or "23:59"
+    # Event-trigger tasks fire on incoming messages and get no clock time
+    time = None if event_type else time or inferred_time or "23:59"
+    if time is not None and parse_minute_of_day(time) is None:
+        raise ValueError(f"invalid time {time!r}")
     title = title or "Reminder"
 
     if channels is None:
@@ -54,65 +90,329 @@ def add_task(
         repeat_rule=repeat_rule,
         enabled=True
     )
+    task.next_fire_at = recurrence.next_fire_after(task, _arming_time(), recurrence.zone(user.timezone))
 
     db.session.add(task)
     db.session.commit()
+    due_index.upsert(task)
+    event_index.upsert(task)
 
     return task
 
 # -------------------------------
-# Delete one task
+# Edit a task
 # -------------------------------
-def delete_task(task_id, user):
+def edit_task(task_id, user, title=None, time=None, action=None):
+    """Update title/time/action of a user's task and reschedule it."""
     task = Task.query.filter_by(id=task_id, user_id=user.id).first()
-    if task:
-        cancel_task(task.id)
-        db.session.delete(task)
-        db.session.commit()
+    if not task:
+        return None
+
+    task.title = title or "Reminder"
+    task.time = None if task.event_type else time or "23:59"
+    task.action = action or ""
+    task.notification_type = infer_task_type(task.action)
+    # Editing re-arms the task, including one-time tasks that already fired;
+    # event-trigger tasks stay armed without a clock time
+    task.next_fire_at = recurrence.next_fire_after(task, _arming_time(), recurrence.zone(user.timezone))
+    task.enabled = task.next_fire_at is not None or task.event_type is not None
+    firing_ledger.forget(task.id)
+    task_cache.invalidate(task.id)
+
+    cancel_task(task.id)
+    schedule_task(task)
+    db.session.commit()
+    due_index.upsert(task)
+    event_index.upsert(task)
+    return task
+
+# -------------------------------
+# Toggle notifications for a task
+# -------------------------------
+def toggle_task_notification(task_id, user):
+    """Flip notify_enabled. Returns the task, or None if not found."""
+    task = Task.query.filter_by(id=task_id, user_id=user.id).first()
+    if not task:
+        return None
+
+    task.notify_enabled = not task.notify_enabled
+    db.session.commit()
+    task_cache.invalidate(task.id)
+    due_index.upsert(task)
+    event_index.upsert(task)
     return task
 
+# -------------------------------
+# User timezone
+# -------------------------------
+def set_user_timezone(user, tz_name):
+    """
+    Store the user's IANA timezone and recompute their tasks' next firing in
+    it. Returns False for an unknown zone.
+    """
+    if not recurrence.is_valid_timezone(tz_name):
+        return False
+    if user.timezone == tz_name:
+        return True
+
+    user.timezone = tz_name
+    tz, now = recurrence.zone(tz_name), _arming_time()
+    tasks = Task.query.filter_by(user_id=user.id, enabled=True).all()
+    for task in tasks:
+        task.next_fire_at = recurrence.next_fire_after(task, now, tz)
+    db.session.commit()
+
+    # Per-task cron jobs run in the owner's zone, so re-register them
+    task_cache.invalidate_many([task.id for task in tasks])
+    schedule_tasks(tasks, tz)
+    due_index.upsert_many(tasks)
+    return True
+
+# -------------------------------
+# Delete one task
+# -------------------------------
+def delete_task(task_id, user):
+    """Delete a user's task without loading it. Returns True if a row was removed."""
+    owned = select(Task.id).where(Task.id == task_id, Task.user_id == user.id)
+    TaskFiring.query.filter(TaskFiring.task_id.in_(owned)).delete(synchronize_session=False)
+    deleted = Task.query.filter_by(id=task_id, user_id=user.id).delete(synchronize_session=False)
+    db.session.commit()
+    if deleted:
+        task_cache.invalidate(task_id)
+        cancel_task(task_id)
+        due_index.remove(task_id)
+        event_index.remove(task_id)
+    return bool(deleted)
+
 # -------------------------------
 # Clear all tasks
 # -------------------------------
 def clear_tasks(user):
-    tasks = Task.query.filter_by(user_id=user.id).all()
-    for task in tasks:
-        cancel_task(task.id)
-        db.session.delete(task)
+    """Set-based delete of all a user's tasks plus one batched job removal."""
+    task_ids = [task_id for (task_id,) in db.session.query(Task.id).filter_by(user_id=user.id)]
+    owned = select(Task.id).where(Task.user_id == user.id)
+    TaskFiring.query.filter(TaskFiring.task_id.in_(owned)).delete(synchronize_session=False)
+    deleted = Task.query.filter_by(user_id=user.id).delete(synchronize_session=False)
     db.session.commit()
-    return len(tasks)
+    task_cache.invalidate_many(task_ids)
+    cancel_tasks(task_ids)
+    due_index.remove_user(user.id)
+    event_index.remove_user(user.id)
+    return deleted
+
+# -------------------------------
+# Paginated listing
+# -------------------------------
+def encode_cursor(created_at, task_id):
+    raw = json.dumps([created_at.isoformat(), task_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, task_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+def list_tasks(user, fields=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of a user's tasks in (created_at, id) order, loading only the
+    requested columns. Returns (items, next_cursor); next_cursor is None on
+    the last page. Raises ValueError for unknown fields or a bad cursor.
+    """
+    fields = list(dict.fromkeys(fields or LISTING_FIELDS))
+    unknown = set(fields) - set(LISTING_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(sorted(unknown))}")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    # The keyset columns are always loaded, even if not returned
+    columns = list(dict.fromkeys(fields + ["created_at", "id"]))
+    query = db.session.query(*(getattr(Task, name) for name in columns)).filter(Task.user_id == user.id)
+    if cursor:
+        after_created, after_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Task.created_at > after_created,
+            and_(Task.created_at == after_created, Task.id > after_id),
+        ))
+    rows = query.order_by(Task.created_at, Task.id).limit(limit + 1).all()
+
+    items = []
+    for row in rows[:limit]:
+        values = row._asdict()
+        item = {name: values[name] for name in fields}
+        if "channels" in item:
+            item["channels"] = [c.strip() for c in (item["channels"] or "").split(",") if c.strip()]
+        for name in ("date_window_start", "date_window_end", "next_fire_at", "created_at"):
+            if item.get(name):
+                item[name] = item[name].isoformat()
+        items.append(item)
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
+
+# -------------------------------
+# Bulk import / export
+# -------------------------------
+def _parse_bool(value, default=True):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y", "on")
+
+def _parse_date(value):
+    if not value:
+        return None
+    return value if isinstance(value, date) else date.fromisoformat(str(value).strip())
+
+def _import_action(record):
+    action = record.get("action") if isinstance(record, dict) else None
+    return (action or "").strip() or "No action"
+
+def _import_mapping(record, user_id, parsed, now, tz):
+    """Turn one import record (dict) into a Task insert mapping. Raises ValueError."""
+    if not isinstance(record, dict):
+        raise TypeError("expected an object per task")
+    action = _import_action(record)
+    inferred_type, inferred_time = parsed
+    events = {f: (record.get(f) or "").strip() or None for f in EVENT_FIELDS}
+    if events["event_type"]:
+        # Fired by incoming messages, no clock time (as in add_task)
+        time = minute = None
+    else:
+        time = (record.get("time") or "").strip() or inferred_time or "23:59"
+        minute = parse_minute_of_day(time)
+        if minute is None:
+            raise ValueError(f"invalid time {time!r}")
+
+    channels = record.get("channels")
+    if isinstance(channels, (list, tuple)):
+        channels = ",".join(str(c).strip() for c in channels if c)
+
+    mapping = {
+        "title": (record.get("title") or "").strip() or "Reminder",
+        "time": time,
+        "minute_of_day": minute,
+        "action": action,
+        "notification_type": record.get("notification_type") or inferred_type,
+        "channels": channels or "",
+        "repeat_rule": record.get("repeat_rule") or "one-time",
+        "date_window_start": _parse_date(record.get("date_window_start")),
+        "date_window_end": _parse_date(record.get("date_window_end")),
+        "enabled": _parse_bool(record.get("enabled")),
+        "notify_enabled": _parse_bool(record.get("notify_enabled")),
+        "user_id": user_id,
+        **events,
+    }
+    schedule = SimpleNamespace(created_at=None, **mapping)
+    mapping["next_fire_at"] = recurrence.next_fire_after(schedule, now, tz) if mapping["enabled"] else None
+    return mapping
+
+def import_tasks(records, user, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Bulk-create tasks from an iterable of dicts (TRANSFER_FIELDS keys).
+    Rows are inserted with executemany in chunks, then scheduled and indexed
+    in one pass. Returns (created_count, errors) where errors is a list of
+    (row_number, message) for rows that were skipped.
+    """
+    created, errors = 0, []
+    now, tz = _arming_time(), recurrence.zone(user.timezone)
+    stmt = insert(Task).returning(
+        Task.id, Task.time, Task.minute_of_day, Task.repeat_rule, Task.channels,
+        Task.date_window_start, Task.date_window_end, Task.created_at,
+        Task.next_fire_at, Task.enabled, Task.notify_enabled, Task.user_id, Task.title, Task.action,
+        Task.event_type, Task.event_sender, Task.event_contact, Task.event_keyword,
+        sort_by_parameter_order=True,
+    )
+
+    numbered = enumerate(records, start=1)
+    while True:
+        batch = list(islice(numbered, chunk_size))
+        if not batch:
+            break
+
+        chunk = []
+        parsed = action_parser.parse_many(_import_action(record) for _, record in batch)
+        for (number, record), parsed_action in zip(batch, parsed):
+            try:
+                chunk.append(_import_mapping(record, user.id, parsed_action, now, tz))
+            except (ValueError, TypeError, AttributeError) as e:
+                errors.append((number, str(e)))
+        if not chunk:
+            continue
+
+        rows = db.session.execute(stmt, chunk).all()
+        db.session.commit()
+        schedule_tasks([r for r in rows if r.enabled], tz)
+        due_index.upsert_many(rows)
+        for row in rows:
+            if row.event_type:
+                event_index.upsert(row)
+        created += len(rows)
+    return created, errors
+
+def export_tasks(user, batch_size=IMPORT_CHUNK_SIZE):
+    """Yield a user's tasks as dicts of TRANSFER_FIELDS, streamed from the DB."""
+    columns = [getattr(Task, name) for name in TRANSFER_FIELDS]
+    rows = (
+        db.session.query(*columns)
+        .filter(Task.user_id == user.id)
+        .order_by(Task.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for row in rows:
+        record = dict(zip(TRANSFER_FIELDS, row))
+        for key in ("date_window_start", "date_window_end"):
+            if record[key]:
+                record[key] = record[key].isoformat()
+        yield record
+
+def read_import_records(text, fmt="json"):
+    """Parse an import payload: a JSON list (or {"tasks": [...]}) or CSV with a header row."""
+    if fmt == "csv":
+        return csv.DictReader(io.StringIO(text))
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("tasks", [])
+    if not isinstance(data, list):
+        raise ValueError("expected a JSON list of tasks")
+    return data
+
+def export_lines(records, fmt="json"):
+    """Serialize exported records incrementally (one chunk per task) as JSON or CSV."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=TRANSFER_FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+        return
+
+    yield "["
+    for i, record in enumerate(records):
+        yield ("," if i else "") + json.dumps(record)
+    yield "]"
 
 # -------------------------------
 # Helper functions
 # -------------------------------
 def infer_task_type(action_text):
     """Infer notification type from keywords."""
-    action_lower = (action_text or "").lower()
-    if any(word in action_lower for word in ["wake me", "alarm", "remind me"]):
-        return "alarm"
-    elif any(word in action_lower for word in ["check", "read", "email", "meeting"]):
-        return "banner"
-    return "push"  # default
+    return action_parser.infer_type(action_text)
 
 def parse_action_for_task(action_text):
     """
     Return (notification_type, time) inferred from action_text.
     Example: "Wake me at 7:30 am" -> ("alarm", "07:30")
     """
-    notification_type = infer_task_type(action_text or "")
-
-    # Extract time if mentioned
-    match = re.search(r"(\d{1,2})([:.]?)(\d{0,2})\s*(am|pm)?", (action_text or "").lower())
-    if match:
-        hour = int(match.group(1))
-        minute = int(match.group(3) or 0)
-        period = match.group(4)
-        if period and period.lower() == "pm" and hour < 12:
-            hour += 12
-        if period and period.lower() == "am" and hour == 12:
-            hour = 0
-        time_str = f"{hour:02d}:{minute:02d}"
-    else:
-        time_str = None
-
-    return notification_type, time_str
+    return action_parser.parse(action_text)
@@ -181,63 +181,106 @@ if (taskAction) taskAction.style.whiteSpace = "pre-wrap";
 window.notifiedTasks = window.notifiedTasks || new Set();
 window.taskNotifications = window.taskNotifications || {}; // id -> boolean
 
-// Use socket created in layout.html
-if (typeof socket !== "undefined") {
-    socket.on("task_notification", function(data) {
-        // data must include id, title, body
-        const id = String(data.id || "");
-        const title = data.title || "Reminder";
-        const body = data.body || "You have a task!";
-        const key = id + "|" + title + "|" + body;
-
-        // only show once per unique message
-        if (window.notifiedTasks.has(key)) return;
-        window.notifiedTasks.add(key);
-
-        // ✅ Determine if notifications enabled
-        const enabled = (id && window.taskNotifications[id] !== undefined) ? window.taskNotifications[id] : false;
-        if (!enabled) return;
-
-        // desktop notification
-        if (Notification.permission === "granted") {
-            new Notification(title, { body: body });
-        }
+function showNotification(data) {
+    // data must include id, title, body
+    const id = String(data.id || "");
+    const title = data.title || "Reminder";
+    const body = data.body || "You have a task!";
+    const key = id + "|" + title + "|" + body;
+
+    // only show once per unique message
+    if (window.notifiedTasks.has(key)) return;
+    window.notifiedTasks.add(key);
+
+    // ✅ Skip only tasks toggled off on this page; the server already filters on
+    // notify_enabled, and tasks on other pages are not in the map at all
+    if (window.taskNotifications[id] === false) return;
+
+    // desktop notification
+    if (Notification.permission === "granted") {
+        new Notification(title, { body: body });
+    }
 
-        // play voice in browser if enabled
+    // play voice in browser if enabled: the server's cached clip when it
+    // renders voice for the browser, else the browser's own TTS
+    const speak = () => {
         try {
             const utter = new SpeechSynthesisUtterance(body);
             speechSynthesis.speak(utter);
         } catch(e) { /* ignore TTS errors */ }
-    });
+    };
+    if (id && document.body.dataset.voiceMode === "browser") {
+        new Audio(`/voice/${encodeURIComponent(id)}.wav`).play().catch(speak);
+    } else {
+        speak();
+    }
 }
 
-// ✅ Periodic check for missed notifications
-setInterval(async () => {
+// ETag of the last answer: the server only returns (or, long-polling, wakes
+// for) notifications this tab has not seen yet
+let pollEtag = null;
+
+// Returns seconds until the user's next due task (the server's hint), null
+// when nothing is scheduled, undefined when the poll failed
+async function pollNotifications(waitSeconds = 0) {
     try {
-        const r = await fetch("/check_notifications");
-        const tasks = await r.json();
-        tasks.forEach(task => {
-            const id = String(task.id || "");
-            const key = id + "|" + (task.title || "") + "|" + (task.body || "");
-            if (!window.notifiedTasks.has(key)) {
-                const enabled = (id && window.taskNotifications[id] !== undefined) ? window.taskNotifications[id] : false;
-                if (!enabled) return;
-
-                if (Notification.permission === "granted") {
-                    new Notification(task.title, { body: task.body });
-                }
-
-                try {
-                    if(enabled) {
-                        const utter = new SpeechSynthesisUtterance(task.body);
-                        speechSynthesis.speak(utter);
-                    }
-                } catch(e) {}
-                window.notifiedTasks.add(key);
+        const url = waitSeconds ? `/check_notifications?wait=${waitSeconds}` : "/check_notifications";
+        const r = await fetch(url, { headers: pollEtag ? { "If-None-Match": pollEtag } : {}, cache: "no-store" });
+        if (r.status !== 200 && r.status !== 304) return undefined;
+        pollEtag = r.headers.get("ETag") || pollEtag;
+        if (r.status === 200) (await r.json()).forEach(showNotification);
+        const dueIn = r.headers.get("X-Next-Due-In");
+        return dueIn === null ? null : Number(dueIn);
+    } catch (e) { console.error(e); return undefined; }
+}
+
+// Use socket created in layout.html
+let pollAfterReconnect = false;
+if (typeof socket !== "undefined") {
+    socket.on("task_notification", showNotification);
+    // several tasks due in the same minute arrive as one batch, and so does
+    // everything that fired while offline (sent by the server on join_room)
+    socket.on("task_notifications", data => (data.items || []).forEach(showNotification));
+    // without the server's outbox, poll for what was pushed while the socket was down
+    socket.on("disconnect", () => { pollAfterReconnect = document.body.dataset.outbox !== "on"; });
+    socket.on("connect", () => {
+        if (pollAfterReconnect) { pollAfterReconnect = false; pollNotifications(); }
+    });
+}
+
+// ✅ Polling is only the fallback: skipped while the socket is connected.
+// "long": each request waits on the server until something is due, so an
+// idle tab makes about one request per long-poll window. "short": sleep
+// until the server's next-due hint (capped, so edits made elsewhere show up).
+const pollIntervalMs = (Number(document.body.dataset.pollInterval) || 300) * 1000;
+const pollMode = document.body.dataset.pollMode || "long";
+const longPollSeconds = Number(document.body.dataset.longPollSeconds) || 50;
+const pollMaxSleepMs = (Number(document.body.dataset.pollMaxSleep) || 900) * 1000;
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+async function pollLoop() {
+    while (true) {
+        if (typeof socket !== "undefined" && socket.connected) {
+            await sleep(pollIntervalMs);
+            continue;
+        }
+        const started = Date.now();
+        const dueIn = await pollNotifications(pollMode === "long" ? longPollSeconds : 0);
+        let delayMs;
+        if (dueIn === undefined) {
+            delayMs = pollIntervalMs;  // error: back off
+        } else {
+            delayMs = dueIn === null ? pollMaxSleepMs : Math.min(Math.max(dueIn * 1000, 1000), pollMaxSleepMs);
+            if (pollMode === "long") {
+                // the server already waited; an immediate answer (something
+                // due now, or too many parked polls) re-polls after a pause
+                delayMs = Date.now() - started >= 1000 ? 0 : Math.min(delayMs, 5000);
             }
-        });
-    } catch (e) { console.error(e); }
-}, 5 * 60 * 1000);
+        }
+        await sleep(delayMs);
+    }
+}
+pollLoop();
 
 // -------------------------------
 // Init once
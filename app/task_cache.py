@@ -0,0 +1,156 @@
+# app/task_cache.py
+"""
+Immutable snapshots of tasks for task_runner.
+
+A per-task cron job needs a dozen columns to decide whether its task is due
+and what to send. Snapshots are built when jobs are registered (bootstrap,
+schedule_task(s)) and replaced after every firing, so a burst of jobs at
+09:00 reads nothing: a job whose task is not due today returns without an
+app context, a due one goes straight to the firing-ledger claim and the
+next_fire_at update (the writes that make delivery exactly-once). A miss is
+read through as one row, without building an ORM object.
+
+task_service calls invalidate() whenever it changes a row. Versions come
+from one generation counter: a snapshot carries the generation at which its
+data was read (begin()), and put() refuses it if the task was invalidated
+since, so a populate racing an edit cannot bring old data back.
+
+Per process, like the due index: with several workers the scheduler runs
+in dispatcher mode, which reads due rows itself.
+"""
+import threading
+
+from app import db, metrics
+from app.models import Task, User
+
+# Columns of a snapshot; "timezone" is the owner's (User.timezone)
+FIELDS = (
+    "id", "user_id", "title", "action", "channels", "time", "minute_of_day",
+    "repeat_rule", "date_window_start", "date_window_end", "created_at",
+    "next_fire_at", "enabled", "notify_enabled", "event_type", "timezone",
+)
+COLUMNS = tuple(getattr(Task, name) for name in FIELDS if name != "timezone")
+
+_lock = threading.Lock()
+_snapshots = {}   # task_id -> TaskSnapshot
+_versions = {}    # task_id -> generation of its last invalidation
+_generation = 0
+
+stats = {"hits": 0, "misses": 0, "invalidations": 0, "refused": 0}
+
+
+class TaskSnapshot:
+    """Read-only view of one task row (plus its owner's timezone)."""
+
+    __slots__ = FIELDS + ("version",)
+
+    def __init__(self, version, values):
+        for name in FIELDS:
+            object.__setattr__(self, name, values[name])
+        object.__setattr__(self, "version", version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TaskSnapshot is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("TaskSnapshot is immutable")
+
+    def __repr__(self):
+        return f"<TaskSnapshot {self.id} v{self.version} next={self.next_fire_at}>"
+
+    def channels_list(self):
+        return [c.strip() for c in self.channels.split(",") if c.strip()] if self.channels else []
+
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in FIELDS}
+        values.update(changes)
+        return TaskSnapshot(self.version, values)
+
+
+def begin():
+    """Generation to stamp on snapshots built from data read from now on."""
+    return _generation
+
+
+def snapshot_of(task, timezone, version):
+    """Snapshot of an ORM task or a row with all COLUMNS; version from begin() before the read."""
+    values = {name: getattr(task, name) for name in FIELDS if name != "timezone"}
+    values["timezone"] = timezone
+    return TaskSnapshot(version, values)
+
+
+# -------------------------------
+# Cache operations
+# -------------------------------
+def put(snapshot):
+    """Store a snapshot unless its task was invalidated after the snapshot's data was read."""
+    with _lock:
+        if _versions.get(snapshot.id, 0) > snapshot.version:
+            stats["refused"] += 1
+            return False
+        _snapshots[snapshot.id] = snapshot
+        return True
+
+
+def put_many(tasks, timezone, version):
+    for task in tasks:
+        put(snapshot_of(task, timezone, version))
+
+
+def get(task_id):
+    snapshot = _snapshots.get(task_id)
+    stats["hits" if snapshot is not None else "misses"] += 1
+    return snapshot
+
+
+def load(task_id):
+    """get(), reading the row through on a miss. Needs an app context; None if the task is gone."""
+    snapshot = get(task_id)
+    if snapshot is not None:
+        return snapshot
+    version = begin()
+    row = (
+        db.session.query(*COLUMNS, User.timezone)
+        .join(User, Task.user_id == User.id)
+        .filter(Task.id == task_id)
+        .first()
+    )
+    if row is None:
+        return None
+    snapshot = snapshot_of(row, row.timezone, version)
+    put(snapshot)
+    return snapshot
+
+
+def advance(task_id, next_fire_at, enabled):
+    """Record a firing's outcome in the cached snapshot, if any."""
+    with _lock:
+        snapshot = _snapshots.get(task_id)
+        if snapshot is not None:
+            _snapshots[task_id] = snapshot.replace(next_fire_at=next_fire_at, enabled=enabled)
+
+
+def invalidate(task_id):
+    invalidate_many((task_id,))
+
+
+def invalidate_many(task_ids):
+    """Drop snapshots of changed/deleted tasks and refuse any built from older reads."""
+    global _generation
+    with _lock:
+        _generation += 1
+        for task_id in task_ids:
+            _versions[task_id] = _generation
+            _snapshots.pop(task_id, None)
+            stats["invalidations"] += 1
+
+
+def clear():
+    invalidate_many(list(_snapshots))
+
+
+@metrics.collector
+def _collect():
+    yield ("task_cache_entries", "gauge", "Task snapshots held for task_runner", (), [((), len(_snapshots))])
+    yield ("task_cache_events_total", "counter", "Task snapshot cache hits, misses, invalidations, refused puts",
+           ("event",), [((key,), value) for key, value in stats.items()])
@@ -0,0 +1,95 @@
+# app/user_cache.py
+"""
+Short-TTL cache behind login_manager.user_loader.
+
+Every authenticated request used to SELECT its user. The cache keeps a
+detached copy of each recently seen user and merges it into the request's
+session with load=False, so current_user stays a normal persistent object
+(changes to it are flushed as usual) without a round-trip.
+
+Any flushed UPDATE or DELETE of a User (password change, timezone change,
+account removal) evicts that user here. Other worker processes see the
+change once their entry expires, so the TTL is kept short.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db, metrics
+from app.models import User
+
+TTL_SECONDS = 60
+CACHE_SIZE = 10_000
+
+_cache = OrderedDict()  # user_id -> (monotonic expiry, detached User copy)
+_lock = threading.Lock()
+
+# "hits", "misses", "invalidations"
+stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def configure(app):
+    global TTL_SECONDS, CACHE_SIZE
+    TTL_SECONDS = app.config.get("USER_CACHE_TTL", TTL_SECONDS)
+    CACHE_SIZE = app.config.get("USER_CACHE_SIZE", CACHE_SIZE)
+
+
+def _detached_copy(user):
+    columns = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+    copy = User(**columns)
+    make_transient_to_detached(copy)
+    return copy
+
+
+def load(user_id):
+    """Return the user bound to the current session, or None. Needs an app context."""
+    if TTL_SECONDS <= 0:
+        return db.session.get(User, user_id)
+
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry[0] < now:
+            del _cache[user_id]
+            entry = None
+        if entry is not None:
+            _cache.move_to_end(user_id)
+    if entry is not None:
+        stats["hits"] += 1
+        return db.session.merge(entry[1], load=False)
+
+    stats["misses"] += 1
+    user = db.session.get(User, user_id)
+    if user is not None:
+        with _lock:
+            _cache[user_id] = (now + TTL_SECONDS, _detached_copy(user))
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return user
+
+
+def invalidate(user_id):
+    with _lock:
+        if _cache.pop(user_id, None) is not None:
+            stats["invalidations"] += 1
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict(mapper, connection, target):
+    invalidate(target.id)
+
+
+@metrics.collector
+def _collect():
+    yield ("user_cache_events_total", "counter", "user_loader cache hits, misses and invalidations", ("event",),
+           [((key,), value) for key, value in stats.items()])
+    yield ("user_cache_entries", "gauge", "Users held in the loader cache", (), [((), len(_cache))])
@@ -0,0 +1,236 @@
+# app/voice.py
+"""
+Voice alerts: one long-lived TTS engine and an on-disk clip cache.
+
+pyttsx3 engines are not thread-safe and slow to start, so a single worker
+thread owns the only engine and every synthesis goes through it. Spoken
+text is rendered once to a WAV file named by the hash of the text and the
+engine settings (content-addressed): a daily reminder that says the same
+thing every day is a cache hit after its first firing. The cache keeps
+VOICE_CACHE_MAX_MB, evicting the least recently used clips.
+
+VOICE_MODE:
+- "server" (default): play the alert on the server, from the cached clip
+  when an audio player is available (winsound, aplay, paplay, afplay),
+  else by speaking directly as before
+- "browser": only render the clip; the page (body data-voice-mode) plays
+  /voice/<task_id>.wav for each notification instead of speechSynthesis
+- "off": no voice alerts
+"""
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from app import metrics
+
+log = logging.getLogger(__name__)
+
+MODE_SERVER = "server"
+MODE_BROWSER = "browser"
+MODE_OFF = "off"
+
+MODE = MODE_SERVER
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "task_scheduler_tts")
+CACHE_MAX_BYTES = 200 * 2**20
+RATE = None    # words per minute; None = engine default
+VOICE = None   # engine voice id; None = engine default
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+_engine = None   # only touched on the tts thread
+_lock = threading.Lock()
+_index = None    # key -> size in bytes, least recently used first
+_cache_bytes = 0
+
+stats = {"hits": 0, "renders": 0, "evictions": 0, "spoken": 0, "played": 0}
+
+
+def configure(app):
+    global MODE, CACHE_DIR, CACHE_MAX_BYTES, RATE, VOICE, _index
+    MODE = app.config.get("VOICE_MODE", MODE)
+    CACHE_DIR = app.config.get("VOICE_CACHE_DIR") or CACHE_DIR
+    CACHE_MAX_BYTES = int(app.config.get("VOICE_CACHE_MAX_MB", CACHE_MAX_BYTES / 2**20) * 2**20)
+    RATE = app.config.get("VOICE_RATE", RATE)
+    VOICE = app.config.get("VOICE_ID", VOICE)
+    with _lock:
+        _index = None  # rescanned on next use
+
+
+def spoken_text(title, body):
+    return f"{title or 'Reminder'}. {body or 'You have a task!'}"
+
+
+def clip_key(text):
+    """Cache key: hash of what is said and how."""
+    return hashlib.sha256(f"{VOICE}|{RATE}|{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f"{key}.wav")
+
+
+# -------------------------------
+# Engine (tts thread only)
+# -------------------------------
+def _get_engine():
+    global _engine
+    if _engine is None:
+        import pyttsx3  # optional, heavy on some platforms: only when a voice alert fires
+        _engine = pyttsx3.init()
+        if RATE:
+            _engine.setProperty("rate", RATE)
+        if VOICE:
+            _engine.setProperty("voice", VOICE)
+    return _engine
+
+
+def _render(text, path):
+    tmp = f"{path}.{os.getpid()}.tmp.wav"
+    engine = _get_engine()
+    engine.save_to_file(text, tmp)
+    engine.runAndWait()
+    os.replace(tmp, path)
+
+
+def _speak(text):
+    engine = _get_engine()
+    engine.say(text)
+    engine.runAndWait()
+
+
+# -------------------------------
+# Clip cache
+# -------------------------------
+def _load_index():
+    """Scan CACHE_DIR once; file mtimes give the LRU order across restarts."""
+    global _index, _cache_bytes
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".wav") and ".tmp" not in name:
+            st = os.stat(os.path.join(CACHE_DIR, name))
+            entries.append((st.st_mtime, name[:-4], st.st_size))
+    _index = OrderedDict((key, size) for _, key, size in sorted(entries))
+    _cache_bytes = sum(_index.values())
+
+
+def _touch(key):
+    global _cache_bytes
+    with _lock:
+        if _index is None:
+            _load_index()
+        if key not in _index:
+            return False
+        _index.move_to_end(key)
+    try:
+        os.utime(_path(key))
+    except FileNotFoundError:  # removed behind our back
+        with _lock:
+            _cache_bytes -= _index.pop(key, 0)
+        return False
+    return True
+
+
+def _admit(key):
+    """Account for a freshly rendered clip and evict LRU clips beyond the size bound."""
+    global _cache_bytes
+    size = os.path.getsize(_path(key))
+    with _lock:
+        if _index is None:
+            _load_index()
+        _cache_bytes += size - _index.pop(key, 0)
+        _index[key] = size
+        while _cache_bytes > CACHE_MAX_BYTES and len(_index) > 1:
+            old, old_size = _index.popitem(last=False)
+            _cache_bytes -= old_size
+            stats["evictions"] += 1
+            try:
+                os.remove(_path(old))
+            except FileNotFoundError:
+                pass
+
+
+def _ensure_clip_sync(text):
+    key = clip_key(text)
+    if _touch(key):
+        stats["hits"] += 1
+        return _path(key)
+    _render(text, _path(key))
+    stats["renders"] += 1
+    _admit(key)
+    log.debug("🔊 Rendered voice clip %s (%d chars)", key, len(text))
+    return _path(key)
+
+
+def ensure_clip(text, timeout=None):
+    """Path of the clip for text, rendering it on the engine worker on a miss."""
+    key = clip_key(text)
+    if _touch(key):
+        stats["hits"] += 1
+        return _path(key)
+    # Re-checked on the worker: an identical request may be queued ahead
+    return _executor.submit(_ensure_clip_sync, text).result(timeout)
+
+
+def cached_clip(text):
+    """Path of the clip if already rendered, else None (never renders)."""
+    key = clip_key(text)
+    return _path(key) if _touch(key) else None
+
+
+# -------------------------------
+# Playback
+# -------------------------------
+@lru_cache(maxsize=1)
+def _player():
+    if os.name == "nt":
+        return "winsound"
+    for name in ("aplay", "paplay", "afplay"):
+        if shutil.which(name):
+            return name
+    return None
+
+
+def _play(path):
+    player = _player()
+    if player == "winsound":
+        import winsound
+        winsound.PlaySound(path, winsound.SND_FILENAME)
+    else:
+        subprocess.run([player, path], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _alert_sync(text):
+    if _player() is None:
+        _speak(text)  # nothing to play a file with: speak as before
+        stats["spoken"] += 1
+        return
+    _play(_ensure_clip_sync(text))
+    stats["played"] += 1
+
+
+def alert(title, body):
+    """Voice alert for the notifier's "voice" channel; blocks until done (the channel has a timeout)."""
+    if MODE == MODE_OFF:
+        return
+    text = spoken_text(title, body)
+    if MODE == MODE_BROWSER:
+        ensure_clip(text)  # pre-render so the browser's fetch is a cache hit
+        return
+    _executor.submit(_alert_sync, text).result()
+
+
+@metrics.collector
+def _collect():
+    with _lock:
+        clips, size = (len(_index), _cache_bytes) if _index is not None else (0, 0)
+    yield ("voice_cache_clips", "gauge", "Rendered voice clips on disk", (), [((), clips)])
+    yield ("voice_cache_bytes", "gauge", "Size of the voice clip cache", (), [((), size)])
+    yield ("voice_events_total", "counter", "Voice clip cache hits, renders, evictions and alerts",
+           ("event",), [((key,), value) for key, value in stats.items()])
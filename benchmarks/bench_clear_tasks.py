@@ -0,0 +1,87 @@
+"""
+Clear-all latency for one heavy user: the old per-row ORM path vs the
+set-based task_service.clear_tasks.
+
+    python benchmarks/bench_clear_tasks.py [tasks_per_user]   # default 10000
+
+Runs in per_task scheduler mode so every task also has an APScheduler job
+to cancel, like production before the dispatcher.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app import scheduler as sched  # noqa: E402
+from app.models import User, Task  # noqa: E402
+from app.services import task_service  # noqa: E402
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+
+def seed(user):
+    rows = [
+        {
+            "title": f"task {i}",
+            "time": f"{i // 60 % 24:02d}:{i % 60:02d}",
+            "minute_of_day": i % 1440,
+            "action": "remind me",
+            "notification_type": "alarm",
+            "repeat_rule": "daily",
+            "enabled": True,
+            "notify_enabled": True,
+            "created_at": datetime.utcnow(),
+            "user_id": user.id,
+        }
+        for i in range(N)
+    ]
+    db.session.execute(Task.__table__.insert(), rows)
+    db.session.commit()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sched._bootstrap_jobs()
+
+
+def legacy_clear(user):
+    """The pre-change implementation: load every row, cancel and delete one by one."""
+    tasks = Task.query.filter_by(user_id=user.id).all()
+    for task in tasks:
+        sched.cancel_task(task.id)
+        db.session.delete(task)
+    db.session.commit()
+    return len(tasks)
+
+
+def timed(fn, user):
+    seed(user)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        deleted = fn(user)
+    return deleted, time.perf_counter() - start
+
+
+def main():
+    app = create_app(testing=True)
+    app.config["SCHEDULER_MODE"] = sched.MODE_PER_TASK
+    sched._app = app
+    sched._mode = sched.MODE_PER_TASK
+    sched.scheduler.start(paused=True)
+
+    with app.app_context():
+        user = User(username="heavy", password="x")
+        db.session.add(user)
+        db.session.commit()
+        for name, fn in (("per_row_orm", legacy_clear), ("set_based", task_service.clear_tasks)):
+            deleted, elapsed = timed(fn, user)
+            print(json.dumps({"path": name, "tasks": N, "deleted": deleted, "seconds": round(elapsed, 4)}))
+
+    sched.scheduler.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Compare the per-task CronTrigger design with the minute dispatcher.
+
+    python benchmarks/bench_dispatcher.py [1000 10000 100000]
+
+For each size N it reports:
+- registration time + traced memory of bootstrapping the scheduler
+- tick latency for one minute's worth of due tasks (N / 60 spread over an hour)
+
+Delivery (socket/voice) is replaced by a counter so only scheduling cost is measured.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app import scheduler as sched  # noqa: E402
+from app.models import User, Task, TaskFiring  # noqa: E402
+
+SIZES = [int(n) for n in sys.argv[1:]] or [1_000, 10_000, 100_000]
+TICK = datetime(2025, 1, 1, 9, 30)
+
+delivered = 0
+
+
+def fake_enqueue(task_id, user_id, title, body, channels=None):
+    global delivered
+    delivered += 1
+
+
+def seed(n):
+    db.session.query(Task).delete()
+    rows = [
+        {
+            "title": f"task {i}",
+            "time": f"09:{i % 60:02d}",
+            "minute_of_day": 9 * 60 + i % 60,
+            "action": "remind me",
+            "notification_type": "alarm",
+            "repeat_rule": "daily",
+            "next_fire_at": datetime(2025, 1, 1, 9, i % 60),
+            "enabled": True,
+            "notify_enabled": True,
+            "created_at": datetime.utcnow(),
+            "user_id": 1 + i % 100,
+        }
+        for i in range(n)
+    ]
+    db.session.execute(Task.__table__.insert(), rows)
+    db.session.commit()
+
+
+def pin_next_fire():
+    """start_scheduler's catch-up advances every task past the wall clock; put them back around TICK."""
+    for minute in range(60):
+        # Slots before TICK already fired today, so only TICK's minute is due
+        day = 1 if minute >= TICK.minute else 2
+        db.session.execute(
+            Task.__table__.update()
+            .where(Task.minute_of_day == 9 * 60 + minute)
+            .values(enabled=True, next_fire_at=datetime(2025, 1, day, 9, minute))
+        )
+    db.session.commit()
+    sched.task_cache.clear()  # snapshots from the bootstrap predate the pinning
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(app, mode, n):
+    global delivered
+    sched.scheduler.remove_all_jobs()
+    TaskFiring.query.delete()
+    db.session.commit()
+    sched.firing_ledger._cache.clear()
+    app.config["SCHEDULER_MODE"] = mode
+    _, reg_s, reg_peak = measure(lambda: sched.start_scheduler(app))
+
+    delivered = 0
+    pin_next_fire()
+    if mode == sched.MODE_DISPATCHER:
+        _, tick_s, _ = measure(lambda: sched.dispatch_due_tasks(TICK))
+    else:
+        # What APScheduler does at 09:30: run every job due at that minute
+        due_ids = [row.id for row in Task.query.with_entities(Task.id).filter_by(minute_of_day=9 * 60 + 30)]
+        sched.utc_now, real_now = (lambda: TICK), sched.utc_now
+        try:
+            _, tick_s, _ = measure(lambda: [sched.task_runner(i) for i in due_ids])
+        finally:
+            sched.utc_now = real_now
+
+    return {
+        "mode": mode,
+        "tasks": n,
+        "jobs": len(sched.scheduler.get_jobs()),
+        "register_s": round(reg_s, 4),
+        "register_peak_mb": round(reg_peak / 2**20, 2),
+        "tick_s": round(tick_s, 4),
+        "delivered": delivered,
+    }
+
+
+def main():
+    app = create_app(testing=True)
+    sched.notifier.enqueue = fake_enqueue
+    sched.scheduler.start(paused=True)
+    sched.scheduler_started = True
+
+    results = []
+    with app.app_context():
+        for uid in range(1, 101):
+            db.session.add(User(id=uid, username=f"user{uid}", password="x"))
+        db.session.commit()
+        for n in SIZES:
+            seed(n)
+            for mode in (sched.MODE_PER_TASK, sched.MODE_DISPATCHER):
+                result = run(app, mode, n)
+                results.append(result)
+                print(json.dumps(result))
+
+    sched.scheduler.shutdown(wait=False)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Event-trigger matching: event_index vs scanning every armed task.
+
+    python benchmarks/bench_event_match.py [100000]
+
+Seeds N armed event tasks (a mix of sender, contact, sender+keyword,
+keyword-only and catch-all filters over a 100k-word vocabulary), loads the
+index and matches a batch of emails and WhatsApp messages. Prints one JSON
+object: index build time, per-message p50/p99 for the index and for a
+linear scan, and whether both agree.
+"""
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from app import create_app, db, event_index  # noqa: E402
+from app.event_index import Message  # noqa: E402
+from app.models import Task, User  # noqa: E402
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+MESSAGES = 500
+SCANNED = 5  # the linear scan takes seconds per message
+rng = random.Random(42)
+WORDS = [f"w{i:05d}" for i in range(100_000)]
+
+
+def task_row(i):
+    kind = "email" if i % 3 else "whatsapp"
+    row = {"title": f"t{i}", "time": "09:00", "minute_of_day": 540, "action": "a",
+           "notification_type": "push", "repeat_rule": "daily", "enabled": True,
+           "notify_enabled": True, "user_id": 1 + i % 100, "event_type": kind,
+           "event_sender": None, "event_contact": None, "event_keyword": None}
+    shape = i % 10
+    if kind == "email" and shape < 4:
+        row["event_sender"] = f"sender{i % 20000}@example.com"
+        if shape < 2:
+            row["event_keyword"] = rng.choice(WORDS)
+    elif kind == "whatsapp" and shape < 6:
+        row["event_contact"] = f"+1 555 {i % 20000:07d}"
+    elif shape < 9:
+        row["event_keyword"] = ", ".join(rng.sample(WORDS, 2))
+    elif i % 1000 == 9:
+        pass  # a few catch-alls
+    else:
+        row["event_keyword"] = " ".join(rng.sample(WORDS, 2))  # phrase
+    return row
+
+
+def message(i):
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 200)))
+    if i % 2:
+        return Message("email", f"Someone <sender{rng.randrange(20000)}@example.com>", None, "Subject", text)
+    return Message("whatsapp", None, f"1555{rng.randrange(20000):07d}", "", text)
+
+
+def linear_match(tasks, msg):
+    """Reference: check every armed task against the message."""
+    kind = msg.kind
+    sender = event_index.normalize_sender(msg.sender)
+    contact = event_index.normalize_contact(msg.contact)
+    text = event_index.normalize_text(f"{msg.subject}\n{msg.text}")
+    matched = []
+    for task in tasks:
+        if task.event_type != kind:
+            continue
+        if task.event_sender and event_index.normalize_sender(task.event_sender) != sender:
+            continue
+        if task.event_contact and event_index.normalize_contact(task.event_contact) != contact:
+            continue
+        keywords = event_index.split_keywords(task.event_keyword)
+        if keywords and not any(re.search(r"(?<!\w)" + re.escape(k) + r"(?!\w)", text) for k in keywords):
+            continue
+        matched.append(task.id)
+    return sorted(matched)
+
+
+def percentile_us(values, pct):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1e6, 1)
+
+
+def main():
+    app = create_app(testing=True, with_scheduler=False)
+    with app.app_context():
+        db.session.execute(User.__table__.insert(),
+                           [{"id": u, "username": f"u{u}", "password": "x"} for u in range(1, 101)])
+        db.session.execute(Task.__table__.insert(), [task_row(i) for i in range(N)])
+        db.session.commit()
+
+        started = time.perf_counter()
+        event_index.load()
+        messages = [message(i) for i in range(MESSAGES)]
+        event_index.match(messages[0])  # builds the automaton
+        build_s = time.perf_counter() - started
+
+        indexed, results = [], []
+        for msg in messages:
+            t = time.perf_counter()
+            results.append(event_index.match(msg))
+            indexed.append(time.perf_counter() - t)
+
+        tasks = Task.query.with_entities(Task.id, Task.event_type, Task.event_sender,
+                                         Task.event_contact, Task.event_keyword).all()
+        scanned, agree = [], True
+        for msg, expected in zip(messages[:SCANNED], results):
+            t = time.perf_counter()
+            agree &= linear_match(tasks, msg) == expected
+            scanned.append(time.perf_counter() - t)
+
+    print(json.dumps({
+        "armed_tasks": event_index.size(),
+        "messages": MESSAGES,
+        "matches": sum(len(r) for r in results),
+        "index_build_s": round(build_s, 3),
+        "index_p50_us": percentile_us(indexed, 50),
+        "index_p99_us": percentile_us(indexed, 99),
+        "scan_p50_us": percentile_us(scanned, 50),
+        "scan_p99_us": percentile_us(scanned, 99),
+        "agree": agree,
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Microbenchmarks for the natural-language action parser.
+
+    python benchmarks/bench_parser.py
+
+Compares the original per-call implementation (kept below for reference)
+with app.services.action_parser: cold (cache cleared), warm (cached) and
+parse_many over a bulk-import sized batch. Also checks both agree.
+"""
+import json
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import action_parser  # noqa: E402
+
+PHRASES = [
+    "Wake me at 7:30 am",
+    "Remind me to call mom at 6 pm",
+    "check email 9.15",
+    "Team meeting at 10:00",
+    "read the report",
+    "buy milk",
+    "set an alarm for 12 am",
+    "Pay electricity bill",
+    "placement cell meeting",
+    "launch to global assignment completion at 11",
+]
+BATCH = PHRASES * 1000  # 10k actions, like a large calendar import
+
+
+def legacy_infer(action_text):
+    action_lower = (action_text or "").lower()
+    if any(word in action_lower for word in ["wake me", "alarm", "remind me"]):
+        return "alarm"
+    elif any(word in action_lower for word in ["check", "read", "email", "meeting"]):
+        return "banner"
+    return "push"
+
+
+def legacy_parse(action_text):
+    notification_type = legacy_infer(action_text or "")
+    match = re.search(r"(\d{1,2})([:.]?)(\d{0,2})\s*(am|pm)?", (action_text or "").lower())
+    if match:
+        hour = int(match.group(1))
+        minute = int(match.group(3) or 0)
+        period = match.group(4)
+        if period and period.lower() == "pm" and hour < 12:
+            hour += 12
+        if period and period.lower() == "am" and hour == 12:
+            hour = 0
+        return notification_type, f"{hour:02d}:{minute:02d}"
+    return notification_type, None
+
+
+def per_call_us(fn, number, per=1):
+    return round(min(timeit.repeat(fn, number=number, repeat=5)) / number / per * 1e6, 3)
+
+
+def cold_parse():
+    action_parser._parse_normalized.cache_clear()
+    for phrase in PHRASES:
+        action_parser.parse(phrase)
+
+
+def main():
+    mismatches = [p for p in PHRASES if legacy_parse(p) != action_parser.parse(p)]
+    results = {
+        "phrases": len(PHRASES),
+        "mismatches": mismatches,
+        "legacy_parse_us": per_call_us(lambda: [legacy_parse(p) for p in PHRASES], 200, len(PHRASES)),
+        "cold_parse_us": per_call_us(cold_parse, 200, len(PHRASES)),
+        "warm_parse_us": per_call_us(lambda: [action_parser.parse(p) for p in PHRASES], 200, len(PHRASES)),
+        "legacy_batch_ms": per_call_us(lambda: [legacy_parse(p) for p in BATCH], 3, 1000),
+        "parse_many_batch_ms": per_call_us(lambda: action_parser.parse_many(BATCH), 3, 1000),
+    }
+    print(json.dumps(results, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Check that reminders fire correctly across daylight-saving changes.
+
+    python benchmarks/check_dst.py
+
+Runs against SQLite in-memory (DATABASE_URL and env files are ignored) and
+never starts the scheduler: dispatcher ticks and per-task cron wake-ups are
+driven by hand over simulated time. For a daily America/New_York reminder:
+
+- 2026-03-08, 02:30 does not exist and must fire once at 03:30 EDT (07:30 UTC)
+- 2026-11-01, 01:30 happens twice and must fire once, on the first (05:30 UTC)
+
+in both SCHEDULER_MODE=dispatcher (recurrence + next_fire_at) and per_task
+(one CronTrigger per task). Prints each case and exits non-zero on failure.
+"""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ZONE = "America/New_York"
+
+# (name, task time, local date, expected slot on that date in naive UTC)
+CASES = [
+    ("spring-forward gap", "02:30", datetime(2026, 3, 8), datetime(2026, 3, 8, 7, 30)),
+    ("fall-back repeat", "01:30", datetime(2026, 11, 1), datetime(2026, 11, 1, 5, 30)),
+]
+
+
+def run_dispatcher(sched, start, end):
+    now = start
+    while now <= end:
+        sched.dispatch_due_tasks(now)
+        now += timedelta(minutes=1)
+
+
+def run_per_task(sched, task, start, end):
+    from app import recurrence
+
+    triggers = {}
+    sched._add_task_job(task, triggers, recurrence.zone(ZONE))
+    trigger = next(iter(triggers.values()))
+    utc_now = sched.utc_now
+    previous, now = None, start.replace(tzinfo=timezone.utc)
+    try:
+        while True:
+            wake = trigger.get_next_fire_time(previous, now)
+            if wake is None or wake.astimezone(timezone.utc).replace(tzinfo=None) > end:
+                break
+            woke_at = wake.astimezone(timezone.utc).replace(tzinfo=None)
+            sched.utc_now = lambda: woke_at
+            sched.task_runner(task.id)
+            previous, now = wake, wake
+    finally:
+        sched.utc_now = utc_now
+        sched.cancel_task(task.id)
+
+
+def main():
+    os.environ.pop("DATABASE_URL", None)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from app import create_app, db, recurrence, task_cache
+    from app import scheduler as sched
+    from app.models import Task, TaskFiring, User
+
+    app = create_app(testing=True, with_scheduler=False)
+    sched._app = app
+    failures = 0
+    with app.app_context():
+        db.session.add(User(id=1, username="dst", password="x", timezone=ZONE))
+        db.session.commit()
+        task_id = 0
+        for mode in ("dispatcher", "per_task"):
+            for name, at, day, expected in CASES:
+                task_id += 1
+                task = Task(id=task_id, user_id=1, title=name, action="check", time=at, repeat_rule="daily",
+                            notification_type="push", enabled=True, notify_enabled=False,
+                            created_at=day - timedelta(days=7))
+                start, end = day - timedelta(days=1), day + timedelta(days=2)
+                task.next_fire_at = recurrence.next_fire_after(task, start, recurrence.zone(ZONE))
+                db.session.add(task)
+                db.session.commit()
+
+                if mode == "dispatcher":
+                    run_dispatcher(sched, start, end)
+                else:
+                    run_per_task(sched, task, start, end)
+
+                fired = [
+                    slot for (slot,) in db.session.query(TaskFiring.scheduled_for)
+                    .filter(TaskFiring.task_id == task_id).order_by(TaskFiring.scheduled_for)
+                ]
+                on_day = [slot for slot in fired if recurrence.to_local(slot, recurrence.zone(ZONE)).date() == day.date()]
+                ok = on_day == [expected]
+                failures += not ok
+                print(f"{mode:<10} {name:<18} {at} {day:%Y-%m-%d}: fired {[f'{s:%m-%d %H:%M}' for s in fired]} UTC"
+                      f"  {'OK' if ok else f'FAIL (expected once at {expected:%H:%M} UTC)'}")
+
+                # Out of the way of the next case's dispatcher ticks
+                Task.query.filter_by(id=task_id).update({"enabled": False})
+                db.session.commit()
+                task_cache.invalidate(task_id)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+/check_notifications latency while a burst of logins hashes passwords.
+
+    python benchmarks/load_login_storm.py [--logins 100] [--rounds 12]
+
+Runs the app under eventlet (as run_prod.py does) on a local port, keeps a
+few logged-in tabs polling /check_notifications, and measures poll latency
+before and during N concurrent logins. It does this twice: with bcrypt
+inline in the request (HASH_OFFLOAD=0, the old behaviour) and offloaded to
+the OS thread pool. Prints one JSON object per mode.
+"""
+import eventlet
+
+eventlet.monkey_patch()
+
+import argparse  # noqa: E402
+import http.client  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from urllib.parse import urlencode  # noqa: E402
+
+import eventlet.wsgi  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+POLLERS = 5
+BASELINE_S = 2.0
+
+
+def request(port, method, path, body=None, cookie=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    headers = {"Content-Type": "application/x-www-form-urlencoded"} if body else {}
+    if cookie:
+        headers["Cookie"] = cookie
+    started = time.perf_counter()
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    elapsed = time.perf_counter() - started
+    set_cookie = response.getheader("Set-Cookie")
+    conn.close()
+    return response.status, elapsed, set_cookie
+
+
+def login(port, username):
+    body = urlencode({"username": username, "password": "secret"})
+    status, elapsed, set_cookie = request(port, "POST", "/login", body)
+    return elapsed, (set_cookie or "").split(";")[0]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000, 2)
+
+
+def summarize(values):
+    return {"n": len(values), "p50_ms": percentile(values, 50), "p99_ms": percentile(values, 99),
+            "max_ms": percentile(values, 100)}
+
+
+def run(offload, logins, rounds):
+    os.environ["HASH_OFFLOAD"] = "1" if offload else "0"
+    os.environ["BCRYPT_LOG_ROUNDS"] = str(rounds)
+    from app import create_app, db, hashing
+    from app.models import User
+
+    app = create_app(testing=True, with_scheduler=False)
+    with app.app_context():
+        pw_hash = hashing.generate_password_hash("secret")
+        db.session.execute(
+            User.__table__.insert(),
+            [{"username": f"user{i}", "password": pw_hash} for i in range(logins + POLLERS)],
+        )
+        db.session.commit()
+
+    listener = eventlet.listen(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    server = eventlet.spawn(eventlet.wsgi.server, listener, app, log_output=False)
+
+    cookies = [login(port, f"user{logins + i}")[1] for i in range(POLLERS)]
+    phase = {"name": "baseline"}
+    samples = {"baseline": [], "storm": []}
+
+    def poller(cookie):
+        while phase["name"] != "done":
+            bucket = samples[phase["name"]]
+            _, elapsed, _ = request(port, "GET", "/check_notifications", cookie=cookie)
+            bucket.append(elapsed)
+            eventlet.sleep(0.01)
+
+    pollers = [eventlet.spawn(poller, c) for c in cookies]
+    eventlet.sleep(BASELINE_S)
+
+    phase["name"] = "storm"
+    started = time.perf_counter()
+    storm = eventlet.GreenPool(logins)
+    login_times = [elapsed for elapsed, _ in storm.imap(lambda i: login(port, f"user{i}"), range(logins))]
+    storm_s = time.perf_counter() - started
+    phase["name"] = "done"
+    for p in pollers:
+        p.wait()
+    server.kill()
+    listener.close()
+
+    return {
+        "mode": "offloaded" if offload else "inline",
+        "logins": logins,
+        "bcrypt_rounds": rounds,
+        "storm_s": round(storm_s, 3),
+        "login": summarize(login_times),
+        "poll_baseline": summarize(samples["baseline"]),
+        "poll_during_storm": summarize(samples["storm"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    for offload in (False, True):
+        print(json.dumps(run(offload, args.logins, args.rounds)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Simulated browser tabs polling /check_notifications: fixed interval vs
+next-due hint (short) vs long poll.
+
+    python benchmarks/load_longpoll_tabs.py [--tabs 300] [--duration 130]
+                                            [--interval 30] [--modes interval,short,long]
+
+Runs the app under eventlet (as run_prod.py does) on a local port with one
+user per tab and one reminder per user, due at the start of the next or the
+one after next minute. Each tab follows the polling logic of tasks.js for
+its mode for --duration seconds:
+
+- interval: GET every --interval seconds (the old behaviour)
+- short:    GET, then sleep until X-Next-Due-In (at most POLL_MAX_SLEEP_SECONDS)
+- long:     GET ?wait=LONGPOLL_MAX_SECONDS with the last ETag, re-poll at once
+
+Prints one JSON object per mode: requests made (total, per tab-minute, and
+per tab-hour once every reminder has fired, i.e. what an idle tab costs),
+reminders delivered, delivery delay after the due minute started, and the
+most long polls parked at once. With --interval above 60 the interval mode
+misses reminders: a poll only sees tasks due in the current minute.
+"""
+import eventlet
+
+eventlet.monkey_patch()
+
+import argparse  # noqa: E402
+import http.client  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import random  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+from datetime import datetime  # noqa: E402
+
+import eventlet.wsgi  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+LONGPOLL_S = 50
+MAX_SLEEP_S = 900
+
+
+def request(port, path, cookie, etag=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=LONGPOLL_S + 30)
+    headers = {"Cookie": cookie}
+    if etag:
+        headers["If-None-Match"] = etag
+    conn.request("GET", path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    due_in = response.getheader("X-Next-Due-In")
+    items = json.loads(body) if response.status == 200 else []
+    return response.status, response.getheader("ETag") or etag, items, int(due_in) if due_in is not None else None
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2)
+
+
+def run(mode, tabs, duration, interval):
+    os.environ["LONGPOLL_MAX_SECONDS"] = str(LONGPOLL_S)
+    os.environ["LONGPOLL_MAX_WAITERS"] = str(tabs * 2)
+    os.environ["POLL_MAX_SLEEP_SECONDS"] = str(MAX_SLEEP_S)
+    from app import create_app, db, due_index, presence
+    from app.models import Task, User
+
+    app = create_app(testing=True, with_scheduler=False)
+    rng = random.Random(7)
+    first_minute = due_index.current_minute() + 1
+    due_minute = {}
+    with app.app_context():
+        db.session.execute(User.__table__.insert(),
+                           [{"id": u, "username": f"tab{u}", "password": "x"} for u in range(1, tabs + 1)])
+        rows = []
+        for u in range(1, tabs + 1):
+            minute = first_minute + rng.randrange(2)
+            due_minute[u] = minute
+            rows.append({"id": u, "user_id": u, "title": f"reminder {u}", "action": "go",
+                         "time": datetime.utcfromtimestamp(minute * 60).strftime("%H:%M"),
+                         "repeat_rule": "one-time", "notification_type": "push", "enabled": True,
+                         "notify_enabled": True, "next_fire_at": datetime.utcfromtimestamp(minute * 60)})
+        db.session.execute(Task.__table__.insert(), rows)
+        db.session.commit()
+        due_index.load()
+        serializer = app.session_interface.get_signing_serializer(app)
+        cookies = {u: f"session={serializer.dumps({'_user_id': str(u)})}" for u in range(1, tabs + 1)}
+
+    listener = eventlet.listen(("127.0.0.1", 0), backlog=tabs)
+    port = listener.getsockname()[1]
+    server = eventlet.spawn(eventlet.wsgi.server, listener, app, log_output=False, max_size=tabs * 2)
+
+    stop_at = time.time() + duration
+    idle_from = (first_minute + 2) * 60 + 5  # every reminder has fired by then
+    counts = {"requests": 0, "not_modified": 0, "errors": 0, "idle": 0}
+    delays = []
+    peak = {"parked": 0}
+
+    def tab(user_id):
+        etag, seen = None, False
+        eventlet.sleep(rng.random() * 2)  # tabs do not open in the same millisecond
+        while time.time() < stop_at:
+            path = f"/check_notifications?wait={LONGPOLL_S}" if mode == "long" else "/check_notifications"
+            started = time.time()
+            try:
+                status, etag, items, due_in = request(port, path, cookies[user_id], etag)
+            except OSError:
+                counts["errors"] += 1
+                eventlet.sleep(interval)
+                continue
+            counts["requests"] += 1
+            counts["idle"] += started >= idle_from
+            counts["not_modified"] += status == 304
+            if items and not seen:
+                seen = True
+                delays.append(time.time() - due_minute[user_id] * 60)
+            if mode == "interval":
+                delay = interval
+            else:
+                delay = MAX_SLEEP_S if due_in is None else min(max(due_in, 1), MAX_SLEEP_S)
+                if mode == "long":
+                    delay = 0 if time.time() - started >= 1 else min(delay, 5)
+            eventlet.sleep(max(0.0, min(delay, stop_at - time.time())))
+
+    def watch():
+        while time.time() < stop_at:
+            peak["parked"] = max(peak["parked"], presence.parked())
+            eventlet.sleep(0.5)
+
+    pool = eventlet.GreenPool(tabs + 1)
+    pool.spawn(watch)
+    for user_id in range(1, tabs + 1):
+        pool.spawn(tab, user_id)
+    pool.waitall()
+    server.kill()
+    listener.close()
+
+    tab_minutes = tabs * duration / 60
+    idle_hours = tabs * max(0.0, stop_at - idle_from) / 3600
+    return {
+        "mode": mode,
+        "tabs": tabs,
+        "duration_s": duration,
+        "interval_s": interval if mode == "interval" else None,
+        "requests": counts["requests"],
+        "requests_per_tab_minute": round(counts["requests"] / tab_minutes, 3),
+        "idle_requests_per_tab_hour": round(counts["idle"] / idle_hours, 1) if idle_hours else None,
+        "not_modified": counts["not_modified"],
+        "errors": counts["errors"],
+        "delivered": len(delays),
+        "missed": tabs - len(delays),
+        "delay_p50_s": percentile(delays, 50),
+        "delay_p99_s": percentile(delays, 99),
+        "peak_parked": peak["parked"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tabs", type=int, default=300)
+    parser.add_argument("--duration", type=float, default=130.0,
+                        help="seconds per mode; >= 120 so both due minutes start within the run")
+    parser.add_argument("--interval", type=float, default=30.0, help="fixed polling interval (interval mode)")
+    parser.add_argument("--modes", default="interval,short,long")
+    args = parser.parse_args()
+    for mode in args.modes.split(","):
+        print(json.dumps(run(mode.strip(), args.tabs, args.duration, args.interval)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Concurrent DB-backed poll load against the configured connection pool.
+
+    python benchmarks/pool_load.py [--threads 50] [--requests 20]
+    python benchmarks/pool_load.py --database-url postgresql://... --destroy-data
+
+By default a temporary SQLite file created by the script stands in for
+Postgres (DATABASE_URL and env files are ignored). A database given with
+--database-url has ALL its tables dropped and re-created before each run,
+so the script refuses to use one unless --destroy-data is passed too. Each
+thread is a logged-in tab fetching /api/tasks (which queries the tasks
+table) in a loop. For every DB_POOL_SIZE in --sizes it prints latency and
+the pool metrics (checkouts, waits, timeouts) as one JSON line.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000, 2) if ordered else None
+
+
+def run(pool_size, threads, requests_per_thread, url):
+    os.environ["DATABASE_URL"] = url
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = "0"
+    from app import create_app, db, db_pool, hashing
+    from app.models import User, Task
+
+    app = create_app(with_scheduler=False)
+    with app.app_context():
+        # A temporary file of ours, or a database the user passed --destroy-data for
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(id=1, username="load", password=hashing.generate_password_hash("secret")))
+        db.session.execute(Task.__table__.insert(), [
+            {"title": f"t{i}", "time": "09:00", "minute_of_day": 540, "action": "a",
+             "notification_type": "push", "repeat_rule": "daily", "enabled": True,
+             "notify_enabled": True, "user_id": 1}
+            for i in range(200)
+        ])
+        db.session.commit()
+    for key in db_pool.stats:
+        db_pool.stats[key] = 0
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def tab():
+        client = app.test_client()
+        client.post("/login", data={"username": "load", "password": "secret"})
+        for _ in range(requests_per_thread):
+            started = time.perf_counter()
+            response = client.get("/api/tasks?limit=50")
+            elapsed = time.perf_counter() - started
+            with lock:
+                (latencies if response.status_code == 200 else errors).append(elapsed)
+
+    workers = [threading.Thread(target=tab) for _ in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - started
+
+    with app.app_context():
+        pool = db_pool.snapshot(db.engine)
+        db.engine.dispose()
+    return {
+        "backend": url.split(":", 1)[0],
+        "pool_size": pool_size,
+        "threads": threads,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "pool": pool,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 10])
+    parser.add_argument("--database-url", help="scratch database to load (default: a temporary SQLite file)")
+    parser.add_argument("--destroy-data", action="store_true",
+                        help="allow dropping every table in --database-url")
+    args = parser.parse_args()
+
+    url = args.database_url
+    if url and not args.destroy_data:
+        parser.error("--database-url drops and re-creates every table in that database; "
+                     "pass --destroy-data if it is a scratch database")
+    if not url:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "pool_load.db")
+    os.environ.setdefault("BCRYPT_LOG_ROUNDS", "4")
+    for size in args.sizes:
+        print(json.dumps(run(size, args.threads, args.requests, url)))
+
+
+if __name__ == "__main__":
+    main()
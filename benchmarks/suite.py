@@ -0,0 +1,384 @@
+"""
+Benchmark suite for the scheduler and notification paths.
+
+    python benchmarks/suite.py [--quick] [--out results.json]
+    python benchmarks/suite.py --compare baseline.json [--threshold 0.2]
+
+Everything runs in one process against create_app(testing=True) (SQLite
+in-memory), so results are comparable across commits on the same machine:
+
+- bootstrap:        start_scheduler with N enabled tasks, per_task and dispatcher mode
+- task_runner:      firing throughput of task_runner (one due task per call)
+                    with snapshots cached as after bootstrap, and cold (read
+                    through), and of one dispatcher tick over the same N tasks
+- check_notifications: requests/sec and latency with M simulated tabs, each
+                    polling with If-None-Match like the browser does
+- socket_fanout:    Socket.IO emits to K rooms with a connected client each,
+                    direct (_emit) and end to end through notifier.enqueue
+
+Writes one JSON document: {"meta": {...}, "results": {scenario: {metric: value}}}.
+With --compare, metrics are diffed against a previous document and the exit
+status is 1 if any moved the wrong way by more than --threshold. Metric names
+say which way is better: *_per_s higher, *_s and *_ms lower; others are
+informational.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BCRYPT_LOG_ROUNDS", "4")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = "secret"
+USERS = 100  # at least; more when --rooms asks for more
+
+FULL = {"tasks": 10_000, "tabs": 20, "polls": 200, "rooms": 200}
+QUICK = {"tasks": 1_000, "tabs": 5, "polls": 50, "rooms": 20}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000, 3)
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+# -------------------------------
+# Fixtures
+# -------------------------------
+class Bench:
+    def __init__(self, users=USERS):
+        from app import create_app, db, hashing, notifier, socketio
+        from app import scheduler as sched
+        from app.models import User
+
+        self.db, self.sched, self.notifier, self.socketio = db, sched, notifier, socketio
+        self.app = create_app(testing=True, with_scheduler=False)
+        # One item per room: the coalescing window would only add latency
+        self.app.config["NOTIFY_COALESCE_SECONDS"] = 0
+        self.users = users
+        self.enqueued = 0
+        self.real_enqueue = notifier.enqueue
+
+        with self.app.app_context():
+            pw_hash = hashing.generate_password_hash(PASSWORD)
+            db.session.execute(User.__table__.insert(), [
+                {"id": uid, "username": f"user{uid}", "password": pw_hash, "timezone": "UTC"}
+                for uid in range(1, users + 1)
+            ])
+            db.session.commit()
+
+        # Jobs are registered but never run on their own; scenarios call them
+        sched.scheduler.start(paused=True)
+        sched.scheduler_started = True
+        sched._app = self.app
+
+    def count_enqueue(self, *args, **kwargs):
+        self.enqueued += 1
+        return True
+
+    def seed(self, n, next_fire_at):
+        """n daily tasks spread over all users and the 24h; all share next_fire_at."""
+        from app import due_index, firing_ledger, task_cache
+        from app.models import Task, TaskFiring
+        db = self.db
+        db.session.query(TaskFiring).delete()
+        db.session.query(Task).delete()
+        db.session.execute(Task.__table__.insert(), [
+            {
+                "title": f"task {i}",
+                "time": f"{i // 60 % 24:02d}:{i % 60:02d}",
+                "minute_of_day": i % 1440,
+                "action": "remind me",
+                "notification_type": "alarm",
+                "repeat_rule": "daily",
+                "next_fire_at": next_fire_at,
+                "enabled": True,
+                "notify_enabled": True,
+                "created_at": datetime(2025, 1, 1),
+                "user_id": 1 + i % self.users,
+            }
+            for i in range(n)
+        ])
+        db.session.commit()
+        firing_ledger._cache.clear()
+        task_cache.clear()  # rows were replaced behind task_service's back
+        due_index.load()
+
+    def close(self):
+        self.sched.scheduler.shutdown(wait=False)
+
+
+# -------------------------------
+# Scenarios
+# -------------------------------
+def bench_bootstrap(bench, n):
+    sched = bench.sched
+    results = {"tasks": n}
+    with bench.app.app_context():
+        # Nothing due: measure registration, not firing
+        bench.seed(n, bench.sched.utc_now() + timedelta(days=1))
+    for mode in (sched.MODE_PER_TASK, sched.MODE_DISPATCHER):
+        sched.scheduler.remove_all_jobs()
+        bench.app.config["SCHEDULER_MODE"] = mode
+        started = time.perf_counter()
+        sched.start_scheduler(bench.app)
+        results[f"{mode}_s"] = round(time.perf_counter() - started, 4)
+        results[f"{mode}_jobs"] = len(sched.scheduler.get_jobs())
+    sched.scheduler.remove_all_jobs()
+    return results
+
+
+def bench_task_runner(bench, n):
+    from app import task_cache
+    sched = bench.sched
+    now = sched.utc_now().replace(second=0, microsecond=0)
+    sched.notifier.enqueue = bench.count_enqueue
+
+    def fire_all(warm):
+        with bench.app.app_context():
+            bench.seed(n, now - timedelta(minutes=1))
+            rows = bench.db.session.query(*task_cache.COLUMNS).all()
+            if warm:  # as registered by the scheduler bootstrap
+                task_cache.put_many(rows, "UTC", task_cache.begin())
+        bench.enqueued = 0
+        started = time.perf_counter()
+        for row in rows:
+            sched.task_runner(row.id)
+        return time.perf_counter() - started, bench.enqueued
+
+    try:
+        runner_s, runner_fired = fire_all(warm=True)
+        cold_s, cold_fired = fire_all(warm=False)
+
+        with bench.app.app_context():
+            bench.seed(n, now - timedelta(minutes=1))
+        bench.enqueued = 0
+        started = time.perf_counter()
+        sched.dispatch_due_tasks(now)
+        tick_s = time.perf_counter() - started
+        tick_fired = bench.enqueued
+    finally:
+        sched.notifier.enqueue = bench.real_enqueue
+    return {
+        "tasks": n,
+        "task_runner_fired": runner_fired,
+        "task_runner_s": round(runner_s, 4),
+        "task_runner_per_s": round(runner_fired / runner_s, 1),
+        "task_runner_cold_fired": cold_fired,
+        "task_runner_cold_per_s": round(cold_fired / cold_s, 1),
+        "dispatch_tick_fired": tick_fired,
+        "dispatch_tick_s": round(tick_s, 4),
+        "dispatch_tick_per_s": round(tick_fired / tick_s, 1),
+    }
+
+
+def bench_check_notifications(bench, tabs, polls, n):
+    with bench.app.app_context():
+        # Every user has tasks due this minute, so first polls carry a payload
+        bench.seed(n, bench.sched.utc_now().replace(second=0, microsecond=0))
+    clients = []
+    for i in range(tabs):
+        client = bench.app.test_client()
+        client.post("/login", data={"username": f"user{1 + i % bench.users}", "password": PASSWORD})
+        clients.append(client)
+
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(tabs + 1)
+
+    def tab(client):
+        etag, mine, codes = None, [], {}
+        barrier.wait()
+        for _ in range(polls):
+            headers = {"If-None-Match": etag} if etag else {}
+            started = time.perf_counter()
+            response = client.get("/check_notifications", headers=headers)
+            mine.append(time.perf_counter() - started)
+            codes[response.status_code] = codes.get(response.status_code, 0) + 1
+            etag = response.headers.get("ETag") or etag
+        with lock:
+            latencies.extend(mine)
+            for code, count in codes.items():
+                statuses[str(code)] = statuses.get(str(code), 0) + count
+
+    workers = [threading.Thread(target=tab, args=(c,)) for c in clients]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - started
+    return {
+        "tabs": tabs,
+        "requests": len(latencies),
+        "statuses": statuses,
+        "requests_per_s": round(len(latencies) / wall, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def bench_socket_fanout(bench, rooms):
+    notifier, socketio = bench.notifier, bench.socketio
+    users = list(range(1, rooms + 1))
+    clients = []
+    for uid in users:
+        http = bench.app.test_client()
+        http.post("/login", data={"username": f"user{uid}", "password": PASSWORD})
+        sio = socketio.test_client(bench.app, flask_test_client=http)
+        sio.emit("join_room", {"room": f"user_{uid}"})
+        clients.append(sio)
+
+    def drain():
+        return sum(len(c.get_received()) for c in clients)
+
+    drain()
+    notifier.start(bench.app, socketio)
+    started = time.perf_counter()
+    for uid in users:
+        notifier._emit(uid, [{"id": uid, "title": "bench", "body": "fan-out"}])
+    direct_s = time.perf_counter() - started
+    direct_received = drain()
+
+    # Through the queue, fan-out workers and socket channel; voice is stubbed out
+    notifier.register_channel("voice", lambda event: None, workers=1, max_pending=len(users))
+    delivered_before = notifier.stats["delivered:socket"]
+    started = time.perf_counter()
+    for uid in users:
+        notifier.enqueue(uid, uid, "bench", "fan-out")
+    deadline = started + 30
+    while notifier.stats["delivered:socket"] - delivered_before < len(users) and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    pipeline_s = time.perf_counter() - started
+    pipeline_received = drain()
+
+    for c in clients:
+        c.disconnect()
+    return {
+        "rooms": rooms,
+        "direct_received": direct_received,
+        "direct_s": round(direct_s, 4),
+        "direct_emits_per_s": round(len(users) / direct_s, 1),
+        "pipeline_received": pipeline_received,
+        "pipeline_s": round(pipeline_s, 4),
+        "pipeline_emits_per_s": round(len(users) / pipeline_s, 1),
+    }
+
+
+# -------------------------------
+# Comparison
+# -------------------------------
+def _direction(metric):
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith("_s") or metric.endswith("_ms"):
+        return -1
+    return 0
+
+
+def compare(baseline, current, threshold):
+    """Print per-metric changes; return the regressions beyond threshold."""
+    regressions = []
+    for scenario, metrics in current["results"].items():
+        before = baseline.get("results", {}).get(scenario, {})
+        for metric, value in metrics.items():
+            old = before.get(metric)
+            direction = _direction(metric)
+            if not direction or not isinstance(value, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            worse = -change * direction
+            flag = "REGRESSED" if worse > threshold else ""
+            print(f"{scenario:20} {metric:24} {old:>12} -> {value:<12} {change:+7.1%} {flag}", file=sys.stderr)
+            if flag:
+                regressions.append(f"{scenario}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quick", action="store_true", help="small sizes, for a smoke run")
+    parser.add_argument("--tasks", type=int, help="N tasks (bootstrap, task_runner)")
+    parser.add_argument("--tabs", type=int, help="M polling tabs")
+    parser.add_argument("--polls", type=int, help="polls per tab")
+    parser.add_argument("--rooms", type=int, help="K Socket.IO rooms")
+    parser.add_argument("--only", nargs="+", help="run only these scenarios")
+    parser.add_argument("--out", help="write the JSON here instead of stdout")
+    parser.add_argument("--compare", help="previous JSON output to diff against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    params = dict(QUICK if args.quick else FULL)
+    for key in params:
+        if getattr(args, key) is not None:
+            params[key] = getattr(args, key)
+
+    scenarios = {
+        "bootstrap": lambda b: bench_bootstrap(b, params["tasks"]),
+        "task_runner": lambda b: bench_task_runner(b, params["tasks"]),
+        "check_notifications": lambda b: bench_check_notifications(b, params["tabs"], params["polls"], USERS * 5),
+        "socket_fanout": lambda b: bench_socket_fanout(b, params["rooms"]),
+    }
+    selected = args.only or list(scenarios)
+
+    commit, dirty = git_revision()
+    document = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": datetime.now().astimezone().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+        },
+        "results": {},
+    }
+    bench = Bench(max(USERS, params["rooms"]))
+    try:
+        for name in selected:
+            print(f"running {name}...", file=sys.stderr)
+            document["results"][name] = scenarios[name](bench)
+    finally:
+        bench.close()
+
+    text = json.dumps(document, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("params") != params:
+            print("warning: baseline was run with different params", file=sys.stderr)
+        regressions = compare(baseline, document, args.threshold)
+        if regressions:
+            print("regressions: " + ", ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
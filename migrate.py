@@ -1,8 +1,8 @@
 from app import create_app, db, migrate
 from flask.cli import FlaskGroup
 
-# Create app
-app = create_app()
+# Create app (no scheduler: it would query columns the migrations are about to add)
+app = create_app(with_scheduler=False)
 migrate.init_app(app, db)
 
 # Create CLI group
@@ -0,0 +1,38 @@
+"""add task_firings ledger
+
+Revision ID: 3f1c2a9d0b6e
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d0b6e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so the table may already exist
+    if sa.inspect(op.get_bind()).has_table('task_firings'):
+        return
+    op.create_table(
+        'task_firings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('scheduled_for', sa.DateTime(), nullable=False),
+        sa.Column('fired_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('task_id', 'scheduled_for', name='uq_task_firings_task_slot'),
+    )
+    op.create_index('ix_task_firings_fired_at', 'task_firings', ['fired_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_task_firings_fired_at', table_name='task_firings')
+    op.drop_table('task_firings')
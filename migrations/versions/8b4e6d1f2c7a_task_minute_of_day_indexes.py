@@ -0,0 +1,70 @@
+"""add tasks.minute_of_day and hot-query indexes
+
+Revision ID: 8b4e6d1f2c7a
+Revises: 3f1c2a9d0b6e
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d1f2c7a'
+down_revision = '3f1c2a9d0b6e'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _minute_of_day(time_str):
+    try:
+        hour, minute = map(int, (time_str or "").split(":"))
+    except ValueError:
+        return None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return hour * 60 + minute
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {c['name'] for c in inspector.get_columns('tasks')}
+    indexes = {i['name'] for i in inspector.get_indexes('tasks')}
+
+    if 'minute_of_day' not in columns:
+        with op.batch_alter_table('tasks') as batch_op:
+            batch_op.add_column(sa.Column('minute_of_day', sa.SmallInteger(), nullable=True))
+
+    # Backfill from the "HH:MM" strings in batches (portable across backends)
+    tasks = sa.table('tasks', sa.column('id', sa.Integer), sa.column('time', sa.String),
+                     sa.column('minute_of_day', sa.SmallInteger))
+    rows = bind.execute(sa.select(tasks.c.id, tasks.c.time).where(tasks.c.minute_of_day.is_(None))).fetchall()
+    update = (
+        tasks.update()
+        .where(tasks.c.id == sa.bindparam('task_id'))
+        .values(minute_of_day=sa.bindparam('minute'))
+    )
+    for start in range(0, len(rows), BATCH_SIZE):
+        params = [
+            {'task_id': task_id, 'minute': _minute_of_day(time_str)}
+            for task_id, time_str in rows[start:start + BATCH_SIZE]
+            if _minute_of_day(time_str) is not None
+        ]
+        if params:
+            bind.execute(update, params)
+
+    if 'ix_tasks_user_minute_notify' not in indexes:
+        op.create_index('ix_tasks_user_minute_notify', 'tasks',
+                        ['user_id', 'minute_of_day', 'notify_enabled'], unique=False)
+    if 'ix_tasks_enabled_minute' not in indexes:
+        op.create_index('ix_tasks_enabled_minute', 'tasks', ['enabled', 'minute_of_day'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_tasks_enabled_minute', table_name='tasks')
+    op.drop_index('ix_tasks_user_minute_notify', table_name='tasks')
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('minute_of_day')
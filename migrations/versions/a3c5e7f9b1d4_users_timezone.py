@@ -0,0 +1,31 @@
+"""add users.timezone; next_fire_at becomes UTC
+
+Revision ID: a3c5e7f9b1d4
+Revises: f7a9c1e3b5d2
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f9b1d4'
+down_revision = 'f7a9c1e3b5d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'timezone' not in columns:
+        op.add_column('users', sa.Column('timezone', sa.String(length=64), nullable=True))
+
+    # Stored values were scheduler-local; clear them so the scheduler
+    # recomputes them as UTC in each owner's zone on its next start.
+    op.execute("UPDATE tasks SET next_fire_at = NULL")
+
+
+def downgrade():
+    op.execute("UPDATE tasks SET next_fire_at = NULL")
+    op.drop_column('users', 'timezone')
@@ -0,0 +1,33 @@
+"""drop the tasks minute_of_day indexes
+
+Nothing queries by minute_of_day any more: the dispatcher and
+/check_notifications use next_fire_at and the due index.
+
+Revision ID: a6c8e0b2d4f6
+Revises: d9f1b3c5e7a0
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c8e0b2d4f6'
+down_revision = 'd9f1b3c5e7a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = {i['name'] for i in sa.inspect(op.get_bind()).get_indexes('tasks')}
+    if 'ix_tasks_enabled_minute' in indexes:
+        op.drop_index('ix_tasks_enabled_minute', table_name='tasks')
+    if 'ix_tasks_user_minute_notify' in indexes:
+        op.drop_index('ix_tasks_user_minute_notify', table_name='tasks')
+
+
+def downgrade():
+    op.create_index('ix_tasks_user_minute_notify', 'tasks',
+                    ['user_id', 'minute_of_day', 'notify_enabled'], unique=False)
+    op.create_index('ix_tasks_enabled_minute', 'tasks', ['enabled', 'minute_of_day'], unique=False)
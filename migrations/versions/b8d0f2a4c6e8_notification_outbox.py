@@ -0,0 +1,41 @@
+"""add notification_outbox
+
+Revision ID: b8d0f2a4c6e8
+Revises: a3c5e7f9b1d4
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0f2a4c6e8'
+down_revision = 'a3c5e7f9b1d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() may have run db.create_all() already
+    if sa.inspect(op.get_bind()).has_table('notification_outbox'):
+        return
+    op.create_table(
+        'notification_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=True),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('body', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_notification_outbox_user_id', 'notification_outbox', ['user_id', 'id'], unique=False)
+    op.create_index('ix_notification_outbox_created_at', 'notification_outbox', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_notification_outbox_created_at', table_name='notification_outbox')
+    op.drop_index('ix_notification_outbox_user_id', table_name='notification_outbox')
+    op.drop_table('notification_outbox')
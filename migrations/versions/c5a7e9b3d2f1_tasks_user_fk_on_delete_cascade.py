@@ -0,0 +1,45 @@
+"""tasks.user_id ON DELETE CASCADE
+
+Revision ID: c5a7e9b3d2f1
+Revises: 8b4e6d1f2c7a
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a7e9b3d2f1'
+down_revision = '8b4e6d1f2c7a'
+branch_labels = None
+depends_on = None
+
+NEW_NAME = 'fk_tasks_user_id_users'
+
+
+def _user_fk():
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys('tasks'):
+        if fk['referred_table'] == 'users':
+            return fk
+    return None
+
+
+def _recreate(ondelete):
+    fk = _user_fk()
+    if fk and (fk.get('options') or {}).get('ondelete', '').upper() == (ondelete or '').upper():
+        return
+    naming = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+    # SQLite has unnamed FKs: batch mode rebuilds the table using the naming convention
+    with op.batch_alter_table('tasks', naming_convention=naming) as batch_op:
+        if fk:
+            batch_op.drop_constraint(fk['name'] or NEW_NAME, type_='foreignkey')
+        batch_op.create_foreign_key(NEW_NAME, 'users', ['user_id'], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _recreate('CASCADE')
+
+
+def downgrade():
+    _recreate(None)
@@ -0,0 +1,28 @@
+"""event-trigger tasks have no clock time; re-arm ones retired at 23:59
+
+Revision ID: d9f1b3c5e7a0
+Revises: b8d0f2a4c6e8
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f1b3c5e7a0'
+down_revision = 'b8d0f2a4c6e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Event tasks were given a 23:59 one-time slot, fired spuriously and were
+    # disabled by the scheduler; nothing else disables a task
+    op.execute(
+        "UPDATE tasks SET next_fire_at = NULL, enabled = TRUE "
+        "WHERE event_type IS NOT NULL"
+    )
+
+
+def downgrade():
+    pass
@@ -0,0 +1,26 @@
+"""index tasks (user_id, created_at, id) for keyset pagination
+
+Revision ID: e2d4f6a8b0c1
+Revises: c5a7e9b3d2f1
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2d4f6a8b0c1'
+down_revision = 'c5a7e9b3d2f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    indexes = {i['name'] for i in sa.inspect(op.get_bind()).get_indexes('tasks')}
+    if 'ix_tasks_user_created_id' not in indexes:
+        op.create_index('ix_tasks_user_created_id', 'tasks', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_tasks_user_created_id', table_name='tasks')
@@ -0,0 +1,34 @@
+"""add tasks.next_fire_at with (enabled, next_fire_at) index
+
+Revision ID: f7a9c1e3b5d2
+Revises: e2d4f6a8b0c1
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a9c1e3b5d2'
+down_revision = 'e2d4f6a8b0c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {c['name'] for c in inspector.get_columns('tasks')}
+    if 'next_fire_at' not in columns:
+        # Backfilled by the scheduler on start (app.scheduler._backfill_next_fire),
+        # which needs the recurrence engine rather than SQL.
+        op.add_column('tasks', sa.Column('next_fire_at', sa.DateTime(), nullable=True))
+
+    indexes = {i['name'] for i in inspector.get_indexes('tasks')}
+    if 'ix_tasks_enabled_next_fire' not in indexes:
+        op.create_index('ix_tasks_enabled_next_fire', 'tasks', ['enabled', 'next_fire_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_tasks_enabled_next_fire', table_name='tasks')
+    op.drop_column('tasks', 'next_fire_at')